@@ -0,0 +1,160 @@
+import pygame
+import random
+import time
+from collections import deque
+import timing
+
+
+# Drives a tank the way the enemy always has: wander between random points
+# at least 500 px apart, keep the turret on the opponent and fire at random
+# intervals of one to SHOT_DELAY_FACTOR times the tank's shot cooldown.
+# think() makes the decisions, steer() carries them out every tick.
+class AIController:
+    HUNT_DISTANCE = 900  # Farther opponents are approached along the shared flow field
+    MIN_TARGET_DISTANCE = 500
+    TARGET_SAMPLES = 8  # Bounded replacement for sampling until a point is far enough
+    SHOT_DELAY_FACTOR = 5  # The default 2000 ms cooldown gives shots 2-10 s apart
+
+    def __init__(self, width, height, shot_cooldown=2000):
+        self.width = width
+        self.height = height
+        self.target = pygame.math.Vector2()
+        self.reset(shot_cooldown)
+
+    def reset(self, shot_cooldown=2000):
+        self.target.update(
+            random.randint(0, self.width),
+            random.randint(0, self.height)
+        )
+        self.next_shot = timing.get_ticks() + self.shot_delay(shot_cooldown)  # None once fired, until think() schedules the next
+        self.opponent = None
+        self.target_reached = False
+        self.hunting = False
+        self.queued = False  # Waiting in the AIScheduler backlog
+
+    def find_opponent(self, tank, tanks):
+        # Stay on the current opponent until it dies, then switch to the
+        # nearest living tank of another team
+        if self.opponent is not None and self.opponent.health > 0:
+            return self.opponent
+        nearest = None
+        nearest_distance = None
+        for other in tanks:
+            if other.team == tank.team or other.health <= 0:
+                continue
+            distance = (other.position - tank.position).length_squared()
+            if nearest is None or distance < nearest_distance:
+                nearest = other
+                nearest_distance = distance
+        if nearest is not None:
+            self.opponent = nearest
+        return self.opponent
+
+    def steer(self, tank, dt=1.0, flow_fields=None):
+        # Cheap per-tick part: drive to the target, aim and fire when the shot is due
+        heading = None
+        if self.hunting and flow_fields is not None:
+            heading = flow_fields.heading(self.opponent, tank.position.x, tank.position.y)
+        if heading is not None:
+            tank.move_along(heading, dt)
+        elif tank.move_to_target(self.target, dt):
+            self.target_reached = True
+
+        if self.opponent is not None:
+            tank.aim_turret_at(self.opponent.position, dt)
+
+        current_time = timing.get_ticks()
+        if self.next_shot is not None and current_time >= self.next_shot and tank.health > 0:
+            self.next_shot = None
+            return tank.shoot()
+        return None
+
+    def think(self, tank, tanks):
+        # Decisions, run by the AIScheduler a few times per second
+        opponent = self.find_opponent(tank, tanks)
+        self.hunting = False
+        if opponent is not None and opponent.health > 0:
+            # Shortest distance across the wrapping screen edges
+            dx = (opponent.position.x - tank.position.x + self.width / 2) % self.width - self.width / 2
+            dy = (opponent.position.y - tank.position.y + self.height / 2) % self.height - self.height / 2
+            self.hunting = dx * dx + dy * dy > self.HUNT_DISTANCE ** 2
+        if self.target_reached:
+            self.pick_target(tank.position)
+            self.target_reached = False
+        if self.next_shot is None:
+            self.next_shot = timing.get_ticks() + self.shot_delay(tank.shot_cooldown)
+
+    def shot_delay(self, shot_cooldown):
+        return random.randint(shot_cooldown, shot_cooldown * self.SHOT_DELAY_FACTOR)
+
+    def pick_target(self, position):
+        # Best of a few random points, taking the first one far enough away.
+        # Small screens may have no point MIN_TARGET_DISTANCE away at all.
+        best = None
+        best_distance = -1
+        for _ in range(self.TARGET_SAMPLES):
+            x = random.randint(0, self.width)
+            y = random.randint(0, self.height)
+            distance = (x - position.x) ** 2 + (y - position.y) ** 2
+            if distance > best_distance:
+                best = (x, y)
+                best_distance = distance
+                if distance >= self.MIN_TARGET_DISTANCE ** 2:
+                    break
+        self.target.update(best)
+
+
+# Runs the AI decisions of every tank at decision_rate, staggered so each
+# tick only handles a slice of the tanks, while steering runs every tick.
+# Due decisions beyond max_decisions or budget_ms wait for the next tick.
+class AIScheduler:
+    def __init__(self, tick_rate, decision_rate=10, max_decisions=None, budget_ms=None, flow_fields=None):
+        self.period = max(1, round(tick_rate / decision_rate))  # Ticks between a tank's decisions
+        self.max_decisions = max_decisions
+        self.budget_ms = budget_ms  # Wall-clock limit; leave unset where runs must be reproducible
+        self.flow_fields = flow_fields  # Shared FlowFields for hunting tanks, if any
+        self.backlog = deque()
+        self.tick = 0
+        self.decisions = 0
+        self.deferred = 0
+
+    def reset(self):
+        # The controllers clear their queued flags in AIController.reset()
+        self.backlog.clear()
+
+    def update(self, tanks, dt=1.0):
+        # Returns the shells fired this tick
+        self.tick += 1
+        slot = self.tick % self.period
+        for index in range(slot, len(tanks), self.period):
+            ai = tanks[index].ai
+            if ai is not None and not ai.queued:
+                ai.queued = True
+                self.backlog.append(tanks[index])
+
+        started = time.perf_counter() if self.budget_ms is not None else 0
+        done = 0
+        backlog = self.backlog
+        while backlog:
+            if self.max_decisions is not None and done >= self.max_decisions:
+                break
+            if self.budget_ms is not None and (time.perf_counter() - started) * 1000 >= self.budget_ms:
+                break
+            tank = backlog.popleft()
+            if tank.ai is None:
+                continue
+            tank.ai.queued = False
+            tank.ai.think(tank, tanks)
+            done += 1
+        self.decisions += done
+        self.deferred += len(backlog)
+
+        if self.flow_fields is not None:
+            self.flow_fields.update(tanks, self.tick)
+        projectiles = []
+        for tank in tanks:
+            if tank.ai is not None:
+                projectile = tank.ai.steer(tank, dt, self.flow_fields)
+                if projectile:
+                    projectiles.append(projectile)
+        return projectiles
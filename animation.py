@@ -0,0 +1,39 @@
+import pygame
+
+
+# A list of pre-rendered frames shared by every instance of an effect
+class FrameStrip:
+    def __init__(self, frames, frame_duration):
+        self.frames = frames
+        self.frame_duration = frame_duration  # milliseconds per frame
+
+    def __len__(self):
+        return len(self.frames)
+
+    def frame_at(self, elapsed):
+        index = int(elapsed // self.frame_duration)
+        return self.frames[max(0, min(index, len(self.frames) - 1))]
+
+    def frame_for_angle(self, angle):
+        # For strips built with rotated(): one frame per angle step
+        step = 360 / len(self.frames)
+        return self.frames[int(round(angle / step)) % len(self.frames)]
+
+    @classmethod
+    def growth(cls, image, target_size, growth_duration, fps=60):
+        # Bake every growth step at the display frame rate; the last frame is full size
+        frame_duration = 1000 / fps
+        count = max(1, int(growth_duration // frame_duration))
+        frames = []
+        for i in range(1, count + 1):
+            scale = min(i * frame_duration / growth_duration, 1.0)
+            size = (int(target_size[0] * scale), int(target_size[1] * scale))
+            frames.append(pygame.transform.scale(image, size))
+        frames.append(pygame.transform.scale(image, target_size))
+        return cls(frames, frame_duration)
+
+    @classmethod
+    def rotated(cls, image, step):
+        count = int(round(360 / step))
+        frames = [pygame.transform.rotate(image, i * step) for i in range(count)]
+        return cls(frames, 0)
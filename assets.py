@@ -0,0 +1,226 @@
+import pygame
+import hashlib
+import os
+import struct
+import threading
+
+import resolution
+
+# Sprites loaded by preload(), as (name, scale, size, flip_y) at render
+# scale 1; an entry with scale 1 and no size is a source image, never resized
+PRELOAD_IMAGES = (
+    ('tank.png', 0.4, None, False),
+    ('tank2.png', 0.4, None, False),
+    ('turret.png', 0.4, None, False),
+    ('turret2.png', 0.4, None, False),
+    ('fire.png', 0.4, None, False),
+    ('fire.png', 1.0, (60, 60), False),
+    ('shell.png', 0.1, None, True),
+    ('explosion.png', 0.4, None, False),
+    ('explosion.png', 1.0, None, False),  # Source of the explosion growth frames
+)
+PRELOAD_SOUNDS = ('fire.mp3', 'track.mp3', 'engine.mp3', 'explosion.mp3')
+SPRITE_CACHE_DIR = os.path.join('cache', 'sprites')
+SPRITE_HEADER = struct.Struct('<II')  # Width, height; RGBA pixels follow
+
+
+def preload_images(scales=None):
+    # PRELOAD_IMAGES at each of the given render scales, by default the current one
+    if scales is None:
+        scales = (resolution.get_scale(),)
+    images = []
+    for scale in scales:
+        for name, image_scale, size, flip_y in PRELOAD_IMAGES:
+            if size is not None:
+                size = (max(1, round(size[0] * scale)), max(1, round(size[1] * scale)))
+            elif image_scale != 1.0:
+                image_scale *= scale
+            if (name, image_scale, size, flip_y) not in images:
+                images.append((name, image_scale, size, flip_y))
+    return images
+
+
+# Stands in for sounds when the mixer is not running (headless mode)
+class SilentSound:
+    def play(self, loops=0):
+        return None
+
+    def stop(self):
+        pass
+
+    def set_volume(self, volume):
+        pass
+
+    def get_length(self):
+        return 0.0
+
+
+# Loads every image and sound once and hands out shared references. Scaled
+# sprites are also kept on disk, keyed by the source file's hash and the scale.
+class AssetCache:
+    def __init__(self, cache_dir=SPRITE_CACHE_DIR):
+        self.images = {}
+        self.sounds = {}
+        self.cache_dir = cache_dir  # None disables the on-disk sprite cache
+        self.source_hashes = {}
+        self.decoded = {}  # Unconverted surfaces from the preload thread
+        self.preload_done = 0
+        self.preload_total = 1
+        self.loader = None
+        self.silent_sound = SilentSound()
+        self.image_loads = 0  # Source files decoded
+        self.variant_loads = 0  # Scaled sprites built or read from the sprite cache
+        self.sound_loads = 0
+        self.disk_bytes = 0
+        self.image_bytes = 0
+        self.sound_bytes = 0
+
+    def image(self, name, scale=1.0, size=None, flip_y=False):
+        key = (name, scale, size, flip_y)
+        if key in self.images:
+            return self.images[key]
+
+        image = self.decoded.pop(key, None)
+        if image is None:
+            image = self._decode_image(name, scale, size, flip_y)
+        return self._install(key, image)
+
+    def _install(self, key, image):
+        # convert_alpha() needs a display mode to be set, and the main thread
+        if pygame.display.get_surface() is not None:
+            image = image.convert_alpha()
+        self.images[key] = image
+        self.image_bytes += image.get_pitch() * image.get_height()
+        return image
+
+    def _decode_image(self, name, scale, size, flip_y):
+        # Safe on the preload thread: reads, decodes and scales, but never converts
+        if scale == 1.0 and size is None and not flip_y:
+            return self._load_source(name)
+        cache_path = self._sprite_cache_path(name, scale, size, flip_y)
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, 'rb') as f:
+                data = f.read()
+            self.disk_bytes += len(data)
+            self.variant_loads += 1
+            width, height = SPRITE_HEADER.unpack_from(data)
+            return pygame.image.frombytes(data[SPRITE_HEADER.size:], (width, height), 'RGBA')
+
+        key = (name, 1.0, None, False)
+        image = self.images.get(key) or self.decoded.get(key)
+        if image is None:
+            image = self._load_source(name)
+            self.decoded[key] = image
+        if flip_y:
+            image = pygame.transform.flip(image, flip_x=False, flip_y=True)
+        if size is None and scale != 1.0:
+            size = (int(image.get_width() * scale), int(image.get_height() * scale))
+        if size is not None:
+            image = pygame.transform.scale(image, size)
+        self.variant_loads += 1
+        if cache_path:
+            self._write_sprite(cache_path, image)
+        return image
+
+    def _load_source(self, name):
+        path = os.path.join('img', name)
+        image = pygame.image.load(path)
+        self.image_loads += 1
+        self.disk_bytes += os.path.getsize(path)
+        return image
+
+    def _source_hash(self, name):
+        digest = self.source_hashes.get(name)
+        if digest is None:
+            with open(os.path.join('img', name), 'rb') as f:
+                digest = hashlib.sha1(f.read()).hexdigest()
+            self.source_hashes[name] = digest
+        return digest
+
+    def _sprite_cache_path(self, name, scale, size, flip_y):
+        if self.cache_dir is None:
+            return None
+        variant = hashlib.sha1(repr((self._source_hash(name), scale, size, flip_y)).encode()).hexdigest()
+        return os.path.join(self.cache_dir, '{}-{}.rgba'.format(os.path.splitext(name)[0], variant[:16]))
+
+    def _write_sprite(self, path, image):
+        # Raw pixels load without PNG decoding or scaling; a failed write only costs the cache
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            data = SPRITE_HEADER.pack(*image.get_size()) + pygame.image.tobytes(image, 'RGBA')
+            with open(path + '.tmp', 'wb') as f:
+                f.write(data)
+            os.replace(path + '.tmp', path)
+        except OSError:
+            pass
+
+    def sound(self, name):
+        if name in self.sounds:
+            return self.sounds[name]
+        if not pygame.mixer.get_init():
+            return self.silent_sound
+        path = os.path.join('sound', name)
+        sound = pygame.mixer.Sound(path)
+        self.sound_loads += 1
+        self.disk_bytes += os.path.getsize(path)
+        self.sound_bytes += self._decoded_size(sound)
+        self.sounds[name] = sound
+        return sound
+
+    def _decoded_size(self, sound):
+        frequency, size, channels = pygame.mixer.get_init()
+        return int(sound.get_length() * frequency) * channels * abs(size) // 8
+
+    def preload(self, scales=None):
+        for args in preload_images(scales):
+            self.image(*args)
+        if pygame.mixer.get_init():
+            for name in PRELOAD_SOUNDS:
+                self.sound(name)
+
+    def preload_async(self, scales=None):
+        # Decodes sprites and sounds on a worker thread; finish_preload()
+        # converts the sprites once the thread is done
+        images = preload_images(scales)
+        self.preload_done = 0
+        self.preload_total = len(images) + (len(PRELOAD_SOUNDS) if pygame.mixer.get_init() else 0)
+        self.loader = threading.Thread(target=self._preload_worker, args=(images,), name='asset-preload',
+                                       daemon=True)
+        self.loader.start()
+        return self.loader
+
+    def _preload_worker(self, images):
+        for name, scale, size, flip_y in images:
+            key = (name, scale, size, flip_y)
+            if key not in self.images and key not in self.decoded:
+                self.decoded[key] = self._decode_image(name, scale, size, flip_y)
+            self.preload_done += 1
+        if pygame.mixer.get_init():
+            for name in PRELOAD_SOUNDS:
+                self.sound(name)
+                self.preload_done += 1
+
+    def preload_progress(self):
+        return self.preload_done / self.preload_total
+
+    def finish_preload(self):
+        if self.loader is not None:
+            self.loader.join()
+            self.loader = None
+        for key in list(self.decoded):
+            self._install(key, self.decoded.pop(key))
+
+    def stats(self):
+        return {
+            'image_loads': self.image_loads,
+            'variant_loads': self.variant_loads,
+            'sound_loads': self.sound_loads,
+            'disk_bytes': self.disk_bytes,
+            'image_bytes': self.image_bytes,
+            'sound_bytes': self.sound_bytes,
+            'cached_images': len(self.images),
+            'cached_sounds': len(self.sounds),
+        }
+
+
+assets = AssetCache()
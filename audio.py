@@ -0,0 +1,156 @@
+import pygame
+from assets import assets
+
+# Mixer channels reserved for each category; no category can take another's
+CATEGORIES = {
+    'engine': 4,
+    'tracks': 6,
+    'fire': 6,
+    'explosions': 8,
+}
+CLIPS = ('engine.mp3', 'track.mp3', 'fire.mp3', 'explosion.mp3')
+
+
+# A looping sound owned by a tank; it keeps its volume while it has no channel
+class Loop:
+    __slots__ = ('category', 'name', 'priority', 'volume', 'target', 'fade', 'channel')
+
+    def __init__(self, category, name, priority):
+        self.category = category
+        self.name = name
+        self.priority = priority
+        self.volume = 0.0
+        self.target = 0.0
+        self.fade = None  # Volume change per reference step, None jumps to the target
+        self.channel = None
+
+
+# Plays every sound through a fixed set of reserved channels. Clips are
+# decoded once in init(); when a category runs out of channels the voice
+# with the lowest priority, then the oldest one, is stolen. Loop volumes
+# fade in update(), once per tick.
+class AudioManager:
+    def __init__(self):
+        self.enabled = False
+        self.sounds = {}
+        self.channels = {}  # Category -> reserved channels
+        self.voices = {}  # Channel -> (priority, start order, loop or None)
+        self.loops = {}  # (owner, category) -> Loop
+        self.order = 0
+        self.plays = 0
+        self.steals = 0
+        self.dropped = 0
+
+    def init(self):
+        # Without a mixer (headless mode) every call is a no-op
+        self.enabled = bool(pygame.mixer.get_init())
+        if not self.enabled:
+            return
+        total = sum(CATEGORIES.values())
+        pygame.mixer.set_num_channels(total)
+        pygame.mixer.set_reserved(total)
+        index = 0
+        for category, count in CATEGORIES.items():
+            self.channels[category] = [pygame.mixer.Channel(index + i) for i in range(count)]
+            index += count
+        for name in CLIPS:
+            self.sounds[name] = assets.sound(name)
+        self.voices.clear()
+
+    def _channel(self, category, priority, steal_equal=True):
+        # A free channel, or the one with the least important, oldest voice
+        victim = None
+        victim_voice = None
+        for channel in self.channels[category]:
+            voice = self.voices.get(channel)
+            if voice is None or voice[2] is None and not channel.get_busy():
+                return channel
+            if voice[0] < priority or steal_equal and voice[0] == priority:
+                if victim is None or voice[:2] < victim_voice[:2]:
+                    victim = channel
+                    victim_voice = voice
+        if victim is not None:
+            self.steals += 1
+            self._release(victim)
+        return victim
+
+    def _release(self, channel):
+        voice = self.voices.pop(channel, None)
+        if voice is not None and voice[2] is not None:
+            voice[2].channel = None
+        channel.stop()
+
+    def _start(self, channel, name, priority, volume, loop=None):
+        channel.play(self.sounds[name], -1 if loop else 0)
+        channel.set_volume(volume)
+        self.voices[channel] = (priority, self.order, loop)
+        self.order += 1
+
+    def play(self, category, name, priority=0, volume=1.0):
+        if not self.enabled:
+            return None
+        channel = self._channel(category, priority)
+        if channel is None:
+            self.dropped += 1
+            return None
+        self._start(channel, name, priority, volume)
+        self.plays += 1
+        return channel
+
+    def set_loop(self, owner, category, name, target, fade=None, priority=0):
+        # Starts, retargets or fades out the owner's loop in this category
+        if not self.enabled:
+            return
+        key = (owner, category)
+        loop = self.loops.get(key)
+        if loop is None:
+            if target <= 0:
+                return
+            loop = Loop(category, name, priority)
+            self.loops[key] = loop
+        loop.target = target
+        loop.fade = fade
+        loop.priority = priority
+
+    def stop_loops(self, owner):
+        for category in CATEGORIES:
+            loop = self.loops.pop((owner, category), None)
+            if loop is not None and loop.channel is not None:
+                self._release(loop.channel)
+
+    def update(self, dt=1.0):
+        if not self.enabled:
+            return
+        for key, loop in list(self.loops.items()):
+            if loop.fade is None:
+                loop.volume = loop.target
+            elif loop.volume < loop.target:
+                loop.volume = min(loop.volume + loop.fade * dt, loop.target)
+            elif loop.volume > loop.target:
+                loop.volume = max(loop.volume - loop.fade * dt, loop.target)
+
+            if loop.volume <= 0 and loop.target <= 0:
+                if loop.channel is not None:
+                    self._release(loop.channel)
+                del self.loops[key]
+                continue
+            if loop.channel is None:
+                # Loops only take a channel from less important voices
+                channel = self._channel(loop.category, loop.priority, steal_equal=False)
+                if channel is None:
+                    continue
+                self._start(channel, loop.name, loop.priority, loop.volume, loop)
+                loop.channel = channel
+            loop.channel.set_volume(loop.volume)
+
+    def stats(self):
+        return {
+            'plays': self.plays,
+            'steals': self.steals,
+            'dropped': self.dropped,
+            'loops': len(self.loops),
+            'voices': sum(1 for channel in self.voices if channel.get_busy()),
+        }
+
+
+audio = AudioManager()
@@ -0,0 +1,109 @@
+import math
+import random
+
+import pygame
+
+
+# Ground texture for a scrolling world, pre-rendered in square chunks. A
+# chunk is painted the first time it comes into view and cached; after each
+# full redraw, chunks more than one chunk away from the view are evicted,
+# so memory and paint cost follow the screen size, not the world size.
+# Chunks cover fixed world areas and are painted at the camera's zoom.
+class ChunkedBackground:
+    CHUNK_SIZE = 256
+    BASE_COLOR = (22, 26, 18)
+    SPECKLE_COLORS = ((30, 35, 24), (17, 20, 14), (36, 38, 28))
+    SPECKLES = 40  # Per full chunk
+    GRID_COLOR = (28, 32, 23)
+
+    def __init__(self, world_width, world_height, seed=0):
+        self.world_width = world_width
+        self.world_height = world_height
+        self.cols = -(-world_width // self.CHUNK_SIZE)
+        self.rows = -(-world_height // self.CHUNK_SIZE)
+        self.seed = seed
+        self.chunks = {}  # (col, row) -> Surface
+        self.zoom = 1.0  # Of the cached chunks
+        self.used = set()  # Chunks blitted since the last eviction
+        self.renders = 0
+        self.evictions = 0
+
+    def chunk(self, col, row):
+        surface = self.chunks.get((col, row))
+        if surface is None:
+            surface = self.render_chunk(col, row)
+            self.chunks[(col, row)] = surface
+            self.renders += 1
+        return surface
+
+    def render_chunk(self, col, row):
+        # The last column and row are narrower when the world is not a multiple of the chunk size
+        width = min(self.CHUNK_SIZE, self.world_width - col * self.CHUNK_SIZE)
+        height = min(self.CHUNK_SIZE, self.world_height - row * self.CHUNK_SIZE)
+        zoom = self.zoom
+        # Rounded up, so neighbouring chunks overlap instead of leaving gaps
+        surface = pygame.Surface((math.ceil(width * zoom), math.ceil(height * zoom)))
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        surface.fill(self.BASE_COLOR)
+        # Its own RNG, so a chunk looks the same every time it is rebuilt
+        rng = random.Random((self.seed * 1000003 + row) * 1000003 + col)
+        for _ in range(self.SPECKLES * width * height // self.CHUNK_SIZE ** 2):
+            color = rng.choice(self.SPECKLE_COLORS)
+            radius = max(1, round(rng.randint(1, 4) * zoom))
+            center = (rng.randrange(width) * zoom, rng.randrange(height) * zoom)
+            pygame.draw.circle(surface, color, center, radius)
+        pygame.draw.line(surface, self.GRID_COLOR, (0, 0), (surface.get_width(), 0))
+        pygame.draw.line(surface, self.GRID_COLOR, (0, 0), (0, surface.get_height()))
+        return surface
+
+    def _spans(self, start, length, world_length, count):
+        # (chunk index, screen offset) of the chunks covering length pixels from world position start
+        spans = []
+        world = start % world_length
+        offset = 0
+        while offset < length:
+            index = int(world // self.CHUNK_SIZE) % count
+            chunk_start = index * self.CHUNK_SIZE
+            spans.append((index, offset - (world - chunk_start)))
+            chunk_length = min(self.CHUNK_SIZE, world_length - chunk_start)
+            offset += chunk_start + chunk_length - world
+            world = (chunk_start + chunk_length) % world_length
+        return spans
+
+    def draw(self, screen, camera, rect=None):
+        # Paints the ground under rect, or the whole screen and then evicts
+        if camera.zoom != self.zoom:
+            self.chunks.clear()
+            self.zoom = camera.zoom
+        zoom = self.zoom
+        if rect is None:
+            area = screen.get_rect()
+        else:
+            area = pygame.Rect(rect).clip(screen.get_rect())
+            if not area.width or not area.height:
+                return
+        screen.set_clip(area)
+        columns = self._spans(camera.x + area.x / zoom, area.width / zoom, self.world_width, self.cols)
+        rows = self._spans(camera.y + area.y / zoom, area.height / zoom, self.world_height, self.rows)
+        blits = []
+        for row, y in rows:
+            for col, x in columns:
+                position = (math.floor(area.x + x * zoom), math.floor(area.y + y * zoom))
+                blits.append((self.chunk(col, row), position))
+                self.used.add((col, row))
+        screen.blits(blits, False)
+        screen.set_clip(None)
+        if rect is None:
+            self.evict()
+
+    def evict(self):
+        keep = set()
+        for col, row in self.used:
+            for dr in (-1, 0, 1):
+                for dc in (-1, 0, 1):
+                    keep.add(((col + dc) % self.cols, (row + dr) % self.rows))
+        for key in [key for key in self.chunks if key not in keep]:
+            del self.chunks[key]
+            self.evictions += 1
+        self.used.clear()
@@ -0,0 +1,150 @@
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import statistics
+import time
+
+from main import Game
+from tank import Tank
+
+# Game attributes that can be swept; everything else is passed to tanks
+GAME_PARAMS = ('tank_hit_radius',)
+
+
+def parse_value(text):
+    # "30:50" is a range such as damage_range, anything else a number
+    if ':' in text:
+        return tuple(int(part) for part in text.split(':'))
+    number = float(text)
+    return int(number) if number.is_integer() else number
+
+
+def parse_sweeps(specs):
+    sweeps = {}
+    for spec in specs:
+        name, values = spec.split('=', 1)
+        sweeps[name] = [parse_value(value) for value in values.split(',')]
+    return sweeps
+
+
+def check_param_names(names):
+    # A misspelt name would just become an unused tank attribute
+    tank = Tank(0, 0)
+    unknown = [name for name in names if name not in GAME_PARAMS and not hasattr(tank, name)]
+    if unknown:
+        raise ValueError("unknown sweep parameters: {}".format(", ".join(sorted(unknown))))
+
+
+def build_configs(sweeps):
+    names = sorted(sweeps)
+    return [dict(zip(names, values))
+            for values in itertools.product(*(sweeps[name] for name in names))]
+
+
+def run_match(job):
+    config_index, params, seed, tick_rate, max_ticks = job
+    game = Game(tick_rate=tick_rate, headless=True, seed=seed)
+    for name, value in params.items():
+        if name in GAME_PARAMS:
+            setattr(game, name, value)
+        else:
+            game.tank_params[name] = value
+    game.reset_game()
+    result = game.simulate(max_ticks)
+    result['config'] = config_index
+    result['seed'] = seed
+    return result
+
+
+def summarize(params, results):
+    matches = len(results)
+    durations = [result['sim_time_ms'] / 1000 for result in results]
+    shots_fired = sum(r['player_shots_fired'] + r['enemy_shots_fired'] for r in results)
+    shots_hit = sum(r['player_shots_hit'] + r['enemy_shots_hit'] for r in results)
+    return {
+        'params': {name: list(value) if isinstance(value, tuple) else value
+                   for name, value in params.items()},
+        'matches': matches,
+        'player_win_rate': sum(r['winner'] == 'player' for r in results) / matches,
+        'enemy_win_rate': sum(r['winner'] == 'enemy' for r in results) / matches,
+        'draw_rate': sum(r['winner'] is None for r in results) / matches,
+        'mean_duration_s': statistics.mean(durations),
+        'median_duration_s': statistics.median(durations),
+        'shots_fired': shots_fired,
+        'shots_hit': shots_hit,
+        'hit_rate': shots_hit / shots_fired if shots_fired else 0.0,
+        'mean_ticks_per_second': statistics.mean(r['ticks_per_second'] for r in results),
+    }
+
+
+def run_batch(configs, matches, seed=0, workers=None, tick_rate=60, max_ticks=None):
+    check_param_names({name for params in configs for name in params})
+    jobs = [(index, params, seed + match, tick_rate, max_ticks)
+            for index, params in enumerate(configs)
+            for match in range(matches)]
+    workers = workers or multiprocessing.cpu_count()
+    start_time = time.perf_counter()
+    with multiprocessing.Pool(workers) as pool:
+        results = pool.map(run_match, jobs, chunksize=max(1, len(jobs) // (workers * 4)))
+    elapsed = time.perf_counter() - start_time
+
+    summaries = [summarize(params, [r for r in results if r['config'] == index])
+                 for index, params in enumerate(configs)]
+    return {
+        'matches': len(results),
+        'workers': workers,
+        'wall_time_s': elapsed,
+        'matches_per_minute': len(results) / elapsed * 60 if elapsed > 0 else 0.0,
+        'configs': summaries,
+        'results': results,
+    }
+
+
+def write_report(report, path):
+    if path.endswith('.csv'):
+        # One row per match, with the swept parameters as extra columns
+        names = sorted({name for config in report['configs'] for name in config['params']})
+        fields = ['config', 'seed'] + names + [
+            'winner', 'ticks', 'sim_time_ms', 'wall_time_s', 'ticks_per_second',
+            'player_shots_fired', 'enemy_shots_fired', 'player_shots_hit', 'enemy_shots_hit']
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+            writer.writeheader()
+            for result in report['results']:
+                row = dict(result)
+                row.update(report['configs'][result['config']]['params'])
+                writer.writerow(row)
+    else:
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run headless Tank Battle matches across CPU cores")
+    parser.add_argument('--matches', type=int, default=100, help="matches per parameter combination")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes, defaults to CPU count")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first match; match i uses seed + i")
+    parser.add_argument('--tick-rate', type=int, default=60, help="simulation ticks per second")
+    parser.add_argument('--max-ticks', type=int, default=60 * 60 * 5, help="end a match as a draw after this many ticks")
+    parser.add_argument('--sweep', action='append', default=[], metavar='NAME=V1,V2',
+                        help="parameter values to sweep, e.g. shot_cooldown=1000,2000 or damage_range=30:50,20:40")
+    parser.add_argument('--output', default='batch_report.json', help="report path, .json or .csv")
+    args = parser.parse_args()
+
+    sweeps = parse_sweeps(args.sweep)
+    try:
+        check_param_names(sweeps)
+    except ValueError as error:
+        parser.error(str(error))
+    configs = build_configs(sweeps)
+    report = run_batch(configs, args.matches, args.seed, args.workers, args.tick_rate, args.max_ticks)
+    write_report(report, args.output)
+
+    for config in report['configs']:
+        print("{params}: player {player_win_rate:.0%} enemy {enemy_win_rate:.0%} "
+              "draw {draw_rate:.0%}, {mean_duration_s:.1f}s, hit rate {hit_rate:.0%}, "
+              "{mean_ticks_per_second:.0f} ticks/s".format(**config))
+    print("{matches} matches in {wall_time_s:.1f}s on {workers} workers "
+          "({matches_per_minute:.0f} matches/min)".format(**report))
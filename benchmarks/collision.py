@@ -0,0 +1,58 @@
+import argparse
+import random
+import statistics
+import time
+
+from main import Game
+from projectile import Projectile
+
+SHELL_COUNTS = (100, 1000, 4000)
+
+
+def run_scenario(pixel_collision, shell_count, ticks, seed, vectorized=False):
+    # Keeps shell_count shells flying through a field of turning tanks and
+    # times only the collision work: shell hits and tank-tank overlaps
+    game = Game(headless=True, seed=seed, enemy_count=15, free_for_all=True,
+                vectorized_projectiles=vectorized, pixel_collision=pixel_collision)
+    rng = random.Random(seed)
+    times = []
+    hits = 0
+    for _ in range(ticks):
+        while len(game.projectiles) < shell_count:
+            game.projectiles.append(Projectile.spawn(
+                rng.uniform(0, game.width), rng.uniform(0, game.height), rng.uniform(0, 360), 0, 0))
+        for tank in game.tanks:
+            tank.body_angle += 1
+            tank.health = tank.max_health  # Nobody dies, so the field stays the same
+            tank.is_dying = False
+        game.update_tank_grid()
+
+        start = time.perf_counter()
+        game.update_projectiles()
+        game.check_tank_collision()
+        times.append((time.perf_counter() - start) * 1000)
+
+        hits += sum(tank.hits_taken for tank in game.tanks)
+        for tank in game.tanks:
+            tank.hits_taken = 0
+        for explosion in game.explosions:
+            explosion.release()
+        game.explosions.clear()
+    return statistics.median(times), hits
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cost of pixel-accurate collision against the radius test")
+    parser.add_argument('--ticks', type=int, default=300, help="ticks per scenario")
+    parser.add_argument('--seed', type=int, default=0, help="random seed")
+    parser.add_argument('--shells', type=int, nargs='*', default=SHELL_COUNTS, help="shell counts to run")
+    parser.add_argument('--vectorized-projectiles', action='store_true', help="use the numpy shell store")
+    args = parser.parse_args()
+
+    print("{:>7} {:>11} {:>11} {:>8} {:>12} {:>12}".format(
+        'shells', 'radius ms', 'pixel ms', 'cost', 'radius hits', 'pixel hits'))
+    for shell_count in args.shells:
+        radius_ms, radius_hits = run_scenario(False, shell_count, args.ticks, args.seed, args.vectorized_projectiles)
+        pixel_ms, pixel_hits = run_scenario(True, shell_count, args.ticks, args.seed, args.vectorized_projectiles)
+        print("{:>7} {:>11.3f} {:>11.3f} {:>+7.1%} {:>12} {:>12}".format(
+            shell_count, radius_ms, pixel_ms, pixel_ms / radius_ms - 1, radius_hits, pixel_hits))
@@ -0,0 +1,61 @@
+import argparse
+import os
+import random
+import statistics
+import time
+
+import pygame
+
+from main import Game
+from profiler import percentile
+
+TANK_COUNTS = (2, 16, 64, 256)
+
+
+def open_offscreen_display(size):
+    # A dummy-driver display lets the asset cache convert sprites the way
+    # the real game does, so blits cost what they cost on screen
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    pygame.display.init()
+    return pygame.display.set_mode(size)
+
+
+def run_scenario(tank_count, frames, seed, screen, world_size=None):
+    random.seed(seed)
+    game = Game(headless=True, enemy_count=tank_count - 1, free_for_all=True, world_size=world_size)
+    game.screen = screen
+    update_times = []
+    draw_times = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        game.update()
+        middle = time.perf_counter()
+        game.draw()
+        end = time.perf_counter()
+        update_times.append((middle - start) * 1000)
+        draw_times.append((end - middle) * 1000)
+    frame_times = [u + d for u, d in zip(update_times, draw_times)]
+    return {
+        'tanks': tank_count,
+        'update_ms': statistics.mean(update_times),
+        'draw_ms': statistics.mean(draw_times),
+        'frame_ms': statistics.mean(frame_times),
+        'frame_p95_ms': percentile(frame_times, 0.95),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Frame time of free-for-all battles by tank count")
+    parser.add_argument('--frames', type=int, default=300, help="frames per scenario")
+    parser.add_argument('--seed', type=int, default=0, help="random seed")
+    parser.add_argument('--tanks', type=int, nargs='*', default=TANK_COUNTS, help="tank counts to run")
+    parser.add_argument('--world', default=None, metavar='WxH',
+                        help="battlefield size; larger than the screen scrolls and culls")
+    args = parser.parse_args()
+    world_size = tuple(int(n) for n in args.world.lower().split('x')) if args.world else None
+
+    screen = open_offscreen_display(Game.HEADLESS_SIZE)
+    print("{:>6} {:>10} {:>10} {:>10} {:>10}".format('tanks', 'update ms', 'draw ms', 'frame ms', 'p95 ms'))
+    for tank_count in args.tanks:
+        result = run_scenario(tank_count, args.frames, args.seed, screen, world_size)
+        print("{tanks:>6} {update_ms:>10.2f} {draw_ms:>10.2f} {frame_ms:>10.2f} {frame_p95_ms:>10.2f}".format(**result))
@@ -0,0 +1,262 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+import pygame
+
+from assets import assets
+from benchmarks.roster import open_offscreen_display
+from explosion import Explosion
+from main import Game
+from pool import allocation_count
+from profiler import percentile
+from replay import KEY_BITS, ReplayKeys
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+TOLERANCE = 0.25  # Allowed slowdown of the median frame times against the baseline
+ALLOC_TOLERANCE = 0.10  # Allowed growth of peak traced memory
+ALLOC_SLACK_KB = 16  # On top of it, so small scenarios do not trip on noise
+FIRE_KEYS = KEY_BITS[pygame.K_w] | KEY_BITS[pygame.K_q]  # Fire while sweeping the turret
+NO_KEYS = ReplayKeys()
+
+
+# Each scenario builds a seeded game and returns it with a step function
+# called at the start of every frame, before the update, to script the
+# action; it may return the player's keys. Everything runs on the simulated clock, so a scenario does the
+# same work on every run and only the timings differ.
+
+def idle_duel(seed):
+    # Two tanks that neither move nor shoot: the fixed cost of a frame
+    game = Game(headless=True, seed=seed, autoplay=False)
+    game.tanks[1].ai = None
+    return game, None
+
+
+def sustained_fire(seed):
+    # Eight tanks sweep their turrets and fire as fast as they can; shells do no damage
+    game = Game(headless=True, seed=seed, autoplay=False, enemy_count=7, free_for_all=True,
+                remote_players=7)
+    game.tank_params = {'shot_cooldown': 100, 'damage_range': (0, 0), 'collision_damage_range': (0, 0)}
+    game.reset_game()
+    keys = ReplayKeys(FIRE_KEYS)
+    for remote_keys in game.remote_keys:
+        remote_keys.mask = FIRE_KEYS
+
+    def step(game, frame):
+        return keys
+    return game, step
+
+
+def mass_explosions(seed):
+    # Twenty explosions a frame at scattered spots, a few hundred alive at once
+    game, _ = idle_duel(seed)
+    rng = random.Random(seed)
+
+    def step(game, frame):
+        for _ in range(20):
+            game.explosions.append(Explosion.spawn(rng.uniform(0, game.width), rng.uniform(0, game.height)))
+    return game, step
+
+
+def death_sequence(seed):
+    # Eight tanks die together on the first frame and burn out
+    game = Game(headless=True, seed=seed, autoplay=False, enemy_count=7, free_for_all=True)
+    for tank in game.tanks:
+        tank.ai = None
+
+    def step(game, frame):
+        if frame == 0:
+            for tank in game.tanks:
+                tank.health = 0
+                tank.start_death_sequence()
+    return game, step
+
+
+def round_reset(seed):
+    # A fresh round every frame, so the update is mostly reset_game()
+    game = Game(headless=True, seed=seed, enemy_count=3, free_for_all=True)
+
+    def step(game, frame):
+        game.reset_game()
+    return game, step
+
+
+SCENARIOS = {
+    'idle_duel': idle_duel,
+    'sustained_fire': sustained_fire,
+    'mass_explosions': mass_explosions,
+    'death_sequence': death_sequence,
+    'round_reset': round_reset,
+}
+
+
+def run_frames(game, step, frames, first, update_times=None, draw_times=None):
+    for frame in range(first, first + frames):
+        start = time.perf_counter()
+        keys = step(game, frame) if step is not None else None
+        game.update(keys or NO_KEYS)
+        middle = time.perf_counter()
+        game.draw()
+        game.present()
+        end = time.perf_counter()
+        if update_times is not None:
+            update_times.append((middle - start) * 1000)
+            draw_times.append((end - middle) * 1000)
+
+
+def summary(samples):
+    return {
+        'mean': round(statistics.mean(samples), 4),
+        'median': round(statistics.median(samples), 4),
+        'p95': round(percentile(samples, 0.95), 4),
+        'max': round(max(samples), 4),
+    }
+
+
+def run_scenario(name, screen, frames, warmup, seed):
+    # Warms up, times frames, then replays the same scenario under
+    # tracemalloc, which would distort the timings if it ran alongside them
+    results = {}
+    for traced in (False, True):
+        random.seed(seed)
+        game, step = SCENARIOS[name](seed)
+        game.display = game.screen = screen
+        run_frames(game, step, warmup, 0)
+        gc.collect()
+        loads = assets.stats()
+        collections = sum(stats['collections'] for stats in gc.get_stats())
+        allocations = allocation_count()
+        if not traced:
+            update_times = []
+            draw_times = []
+            run_frames(game, step, frames, warmup, update_times, draw_times)
+            stats = assets.stats()
+            # Warmed-up pools should hand out only recycled shells, explosions and fires
+            results['pool_allocations'] = allocation_count() - allocations
+            results['update_ms'] = summary(update_times)
+            results['draw_ms'] = summary(draw_times)
+            results['asset_loads'] = sum(stats[kind] - loads[kind]
+                                         for kind in ('image_loads', 'variant_loads', 'sound_loads'))
+            results['gc_collections'] = sum(stats['collections'] for stats in gc.get_stats()) - collections
+            results['work'] = {
+                'ticks': game.ticks,
+                'projectiles': len(game.projectiles),
+                'explosions': len(game.explosions),
+                'tanks_alive': sum(tank.health > 0 for tank in game.tanks),
+                'shots_fired': sum(tank.shots_fired for tank in game.tanks),
+            }
+        else:
+            tracemalloc.start()
+            run_frames(game, step, frames, warmup)
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results['alloc_kb'] = round(current / 1024, 1)  # Still held at the end
+            results['alloc_peak_kb'] = round(peak / 1024, 1)
+    return results
+
+
+def steady_state_problems(results):
+    # Scenarios whose pools still allocated after the warm-up, as printable lines
+    return ["{}: {} pooled objects allocated after the warm-up".format(name, result['pool_allocations'])
+            for name, result in results['scenarios'].items() if result['pool_allocations']]
+
+
+def compare(results, baseline, tolerance, alloc_tolerance):
+    # Regressions of results against baseline, as printable lines
+    problems = []
+    for name, result in results['scenarios'].items():
+        base = baseline['scenarios'].get(name)
+        if base is None:
+            continue
+        if result['work'] != base['work']:
+            problems.append("{}: did different work than the baseline {} != {}".format(
+                name, result['work'], base['work']))
+        for metric in ('update_ms', 'draw_ms'):
+            now = result[metric]['median']
+            before = base[metric]['median']
+            if now > before * (1 + tolerance):
+                problems.append("{}: {} median {:.3f} ms, baseline {:.3f} ms ({:+.0%})".format(
+                    name, metric, now, before, now / before - 1))
+        if result['alloc_peak_kb'] > base['alloc_peak_kb'] * (1 + alloc_tolerance) + ALLOC_SLACK_KB:
+            problems.append("{}: peak allocations {:.1f} KB, baseline {:.1f} KB".format(
+                name, result['alloc_peak_kb'], base['alloc_peak_kb']))
+        if result['pool_allocations'] > base['pool_allocations']:
+            problems.append("{}: {} pooled objects allocated during frames, baseline {}".format(
+                name, result['pool_allocations'], base['pool_allocations']))
+        if result['asset_loads'] > base['asset_loads']:
+            problems.append("{}: {} asset loads during frames, baseline {}".format(
+                name, result['asset_loads'], base['asset_loads']))
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scripted benchmark scenarios compared against a stored baseline")
+    parser.add_argument('--scenarios', nargs='*', default=list(SCENARIOS), choices=list(SCENARIOS),
+                        help="scenarios to run")
+    parser.add_argument('--frames', type=int, default=300, help="measured frames per scenario")
+    parser.add_argument('--warmup', type=int, default=180,
+                        help="unmeasured frames before them, enough for the pools to fill")
+    parser.add_argument('--seed', type=int, default=0, help="random seed")
+    parser.add_argument('--output', default=None, help="write the results to this JSON file")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="baseline JSON to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="store the results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help="allowed slowdown of median update and draw times, as a fraction")
+    parser.add_argument('--alloc-tolerance', type=float, default=ALLOC_TOLERANCE,
+                        help="allowed growth of peak allocations, as a fraction")
+    args = parser.parse_args()
+
+    screen = open_offscreen_display(Game.HEADLESS_SIZE)
+    results = {
+        'meta': {
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'machine': platform.machine(),
+            'frames': args.frames,
+            'warmup': args.warmup,
+            'seed': args.seed,
+        },
+        'scenarios': {},
+    }
+    print("{:<16} {:>10} {:>10} {:>10} {:>10} {:>10} {:>6} {:>6}".format(
+        'scenario', 'update ms', 'p95', 'draw ms', 'p95', 'peak KB', 'loads', 'pool'))
+    for name in args.scenarios:
+        result = run_scenario(name, screen, args.frames, args.warmup, args.seed)
+        results['scenarios'][name] = result
+        print("{:<16} {:>10.3f} {:>10.3f} {:>10.3f} {:>10.3f} {:>10.1f} {:>6} {:>6}".format(
+            name, result['update_ms']['median'], result['update_ms']['p95'],
+            result['draw_ms']['median'], result['draw_ms']['p95'],
+            result['alloc_peak_kb'], result['asset_loads'], result['pool_allocations']))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    failed = False
+    for problem in steady_state_problems(results):
+        print("ALLOCATION " + problem)
+        failed = True
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print("Baseline saved to {}".format(args.baseline))
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        problems = compare(results, baseline, args.tolerance, args.alloc_tolerance)
+        for problem in problems:
+            print("REGRESSION " + problem)
+        if problems:
+            failed = True
+        else:
+            print("No regressions against {}".format(args.baseline))
+    else:
+        print("No baseline at {}; run with --save-baseline to store one".format(args.baseline))
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,58 @@
+# Maps world positions to the screen. When the world is larger than the
+# view it centres on the followed tank and wraps with the world, so things
+# just across a world edge show up next to it; otherwise the view shows
+# the world as is. Screen positions are in render pixels, zoom per world
+# pixel. sees() is the culling test for the draw pass.
+class Camera:
+    WRAP_MARGIN = 200  # Things this far behind the view's left/top edge are drawn there, not beyond the right/bottom
+
+    def __init__(self, world_width, world_height):
+        self.world_width = world_width
+        self.world_height = world_height
+        self.view_width = 0  # Render pixels
+        self.view_height = 0
+        self.zoom = 1.0
+        self.x = 0  # World position of the view's top-left corner
+        self.y = 0
+        self.follows = False
+        self.moved = True  # Whether the view changed since the previous frame
+        self.drawn = 0
+        self.culled = 0
+
+    def update(self, view_size, x, y, zoom=1.0):
+        view_width, view_height = view_size
+        # The view's extent in world pixels
+        width = view_width / zoom
+        height = view_height / zoom
+        follows = round(width) < self.world_width or round(height) < self.world_height
+        if follows:
+            # Whole render pixels, so a still camera keeps the same pixel grid
+            left = round((x - width / 2) * zoom) / zoom % self.world_width
+            top = round((y - height / 2) * zoom) / zoom % self.world_height
+        else:
+            left = top = 0
+        state = (left, top, view_width, view_height, zoom, follows)
+        self.moved = state != (self.x, self.y, self.view_width, self.view_height, self.zoom, self.follows)
+        self.x, self.y, self.view_width, self.view_height, self.zoom, self.follows = state
+
+    def to_screen(self, x, y):
+        zoom = self.zoom
+        if not self.follows:
+            return x * zoom, y * zoom
+        screen_x = (x - self.x) % self.world_width
+        if screen_x > self.world_width - self.WRAP_MARGIN:
+            screen_x -= self.world_width
+        screen_y = (y - self.y) % self.world_height
+        if screen_y > self.world_height - self.WRAP_MARGIN:
+            screen_y -= self.world_height
+        return screen_x * zoom, screen_y * zoom
+
+    def sees(self, screen_x, screen_y, radius):
+        # Whether anything within radius (world pixels) of this screen position is in view
+        radius *= self.zoom
+        if (-radius < screen_x < self.view_width + radius and
+                -radius < screen_y < self.view_height + radius):
+            self.drawn += 1
+            return True
+        self.culled += 1
+        return False
@@ -0,0 +1,91 @@
+import math
+from collections import OrderedDict
+
+import pygame
+
+
+# Caches collision masks of rotated sprites, keyed by sprite and quantized
+# angle, the way RotationCache does for the rotated surfaces. Masks are
+# built from sprites at render scale 1, so hits do not depend on how the
+# game is drawn. Least recently used entries go once the cache is full.
+class MaskCache:
+    def __init__(self, step=2.0, max_entries=4096):
+        self.step = step
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.radii = {}  # Sprite -> radius of the circle around any rotation
+        self.core_radii = {}  # Sprite -> radius of the opaque circle inside every rotation
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def quantize(self, angle):
+        return round(angle / self.step) * self.step % 360
+
+    def get(self, image, angle):
+        # (mask, half width, half height) of image rotated like rotations.get(image, angle)
+        key = (image, self.quantize(angle))
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        mask = pygame.mask.from_surface(pygame.transform.rotate(image, key[1]))
+        width, height = mask.get_size()
+        entry = (mask, width / 2, height / 2)
+        self.entries[key] = entry
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def radius(self, image):
+        # Broadphase radius: half the sprite's diagonal
+        radius = self.radii.get(image)
+        if radius is None:
+            radius = math.hypot(*image.get_size()) / 2
+            self.radii[image] = radius
+        return radius
+
+    def core_radius(self, image):
+        # Anything closer to the centre than this is inside the sprite at any
+        # angle, so the mask test can be skipped: the distance to the nearest
+        # transparent pixel or the sprite's edge
+        radius = self.core_radii.get(image)
+        if radius is None:
+            mask = pygame.mask.from_surface(image)
+            width, height = mask.get_size()
+            radius = min(width, height) / 2
+            for x in range(width):
+                for y in range(height):
+                    if not mask.get_at((x, y)):
+                        radius = min(radius, math.hypot(x + 0.5 - width / 2, y + 0.5 - height / 2))
+            self.core_radii[image] = radius
+        return radius
+
+    def overlap(self, image, angle, x, y, other, other_angle, other_x, other_y):
+        # Whether the two rotated sprites centred at these positions share an opaque pixel
+        mask, half_width, half_height = self.get(image, angle)
+        other_mask, other_half_width, other_half_height = self.get(other, other_angle)
+        offset = (round(other_x - other_half_width - x + half_width),
+                  round(other_y - other_half_height - y + half_height))
+        return mask.overlap(other_mask, offset) is not None
+
+    def clear(self):
+        self.entries.clear()
+        self.radii.clear()
+        self.core_radii.clear()
+
+    def stats(self):
+        return {
+            'step': self.step,
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+masks = MaskCache()
@@ -0,0 +1,285 @@
+import argparse
+import math
+import multiprocessing
+import random
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import pygame
+
+import timing
+from main import Game
+from replay import KEY_BITS, ReplayKeys
+
+# Action: (throttle, rotate, turret, fire), each an index into its controls
+THROTTLE = (0, KEY_BITS[pygame.K_UP], KEY_BITS[pygame.K_DOWN])
+ROTATE = (0, KEY_BITS[pygame.K_LEFT], KEY_BITS[pygame.K_RIGHT])
+TURRET = (0, KEY_BITS[pygame.K_q], KEY_BITS[pygame.K_e])
+FIRE = (0, KEY_BITS[pygame.K_w])
+ACTION_NVEC = (len(THROTTLE), len(ROTATE), len(TURRET), len(FIRE))
+
+# Per tank, the agent first: x, y, cos/sin body angle, cos/sin turret angle
+# (world), health, cooldown left, speed. The agent's position is absolute,
+# the others' are wrapped offsets from it, both divided by the world size.
+TANK_FEATURES = 9
+# Per nearby shell, nearest first: offset, velocity, present flag
+SHELL_FEATURES = 5
+MAX_SHELLS = 8
+SHELL_RANGE = 600  # Shells further than this from the agent are left out
+
+
+# Reinforcement-learning interface around a headless Game: the player tank
+# takes its controls from step(), every other tank is driven by the normal
+# AI. An episode is one round. Nothing is drawn unless render() is called.
+# The game draws from the shared random module; each env swaps in its own
+# generator state around reset() and step(), so envs in one process keep
+# independent, reproducible streams.
+class TankEnv:
+    def __init__(self, seed=None, tick_rate=60, frame_skip=1, max_steps=3600, enemy_count=1,
+                 world_size=None, observation=None):
+        if seed is None:
+            seed = random.randrange(2 ** 63)  # Otherwise envs would copy one state
+        self.game = Game(tick_rate=tick_rate, headless=True, seed=seed, autoplay=False,
+                         enemy_count=enemy_count, world_size=world_size)
+        self.rng_state = random.getstate()
+        self.frame_skip = frame_skip  # Ticks per step, the action repeats
+        self.max_steps = max_steps
+        self.keys = ReplayKeys()
+        self.observation_size = TANK_FEATURES * (1 + enemy_count) + SHELL_FEATURES * MAX_SHELLS
+        # step() and reset() fill this array in place; it may be a view into shared memory
+        self.observation = np.zeros(self.observation_size, np.float32) if observation is None else observation
+        self.steps = 0
+        self.shell_speed = 5 * self.game.dt  # Shell speed per tick, for scaling velocities
+        self.screen = None
+
+    def reset(self):
+        # Starts a new round; returns (observation, info)
+        timing.set_clock(self.game.sim_clock)
+        random.setstate(self.rng_state)
+        self.game.reset_game()
+        self.rng_state = random.getstate()
+        self.steps = 0
+        self.observe()
+        return self.observation, {}
+
+    def step(self, action):
+        # Returns (observation, reward, terminated, truncated, info). The
+        # observation array is overwritten by the next step; copy it to keep it.
+        game = self.game
+        timing.set_clock(game.sim_clock)
+        random.setstate(self.rng_state)
+        throttle, rotate, turret, fire = action
+        self.keys.mask = THROTTLE[throttle] | ROTATE[rotate] | TURRET[turret] | FIRE[fire]
+        agent = game.player_tank
+        health = agent.health
+        dealt = agent.damage_dealt
+        for _ in range(self.frame_skip):
+            game.update(self.keys)
+            if game.show_victory or game.show_game_over:
+                break
+        self.rng_state = random.getstate()
+        self.steps += 1
+        # Damage the agent's shells dealt minus damage taken, in tank healths
+        dealt = agent.damage_dealt - dealt
+        taken = health - agent.health
+        reward = (dealt - taken) / agent.max_health
+        terminated = game.show_victory or game.show_game_over
+        truncated = not terminated and self.steps >= self.max_steps
+        self.observe()
+        return self.observation, reward, terminated, truncated, {'victory': game.show_victory}
+
+    def observe(self):
+        game = self.game
+        out = self.observation
+        now = timing.get_ticks()
+        agent = game.player_tank
+        width = game.width
+        height = game.height
+        offset = 0
+        for index, tank in enumerate(game.tanks):
+            if index == 0:
+                x = tank.position.x / width
+                y = tank.position.y / height
+            else:
+                dx, dy = game.tank_grid.wrapped_delta(tank.position, agent.position)
+                x = dx / width
+                y = dy / height
+            body = math.radians(tank.body_angle)
+            turret = math.radians(tank.body_angle + tank.turret_angle)
+            cooldown = max(0, tank.last_shot_time + tank.shot_cooldown - now) / tank.shot_cooldown
+            out[offset:offset + TANK_FEATURES] = (
+                x, y, math.cos(body), math.sin(body), math.cos(turret), math.sin(turret),
+                tank.health / tank.max_health, cooldown, tank.current_speed / tank.max_speed)
+            offset += TANK_FEATURES
+
+        shells = out[offset:]
+        shells[:] = 0
+        nearby = self.nearby_shells(agent.position.x, agent.position.y)
+        speed = self.shell_speed
+        for i, (_, dx, dy, vx, vy) in enumerate(nearby):
+            shells[i * SHELL_FEATURES:(i + 1) * SHELL_FEATURES] = (
+                dx / SHELL_RANGE, dy / SHELL_RANGE, vx / speed, vy / speed, 1.0)
+        return out
+
+    def nearby_shells(self, x, y):
+        # The MAX_SHELLS nearest shells within SHELL_RANGE as (distance², dx, dy, vx, vy)
+        game = self.game
+        if game.vectorized_projectiles:
+            store = game.projectiles
+            shells = zip(store.positions[:store.count].tolist(), store.velocities[:store.count].tolist())
+        else:
+            shells = ((projectile.position, projectile.velocity) for projectile in game.projectiles)
+        range_sq = SHELL_RANGE * SHELL_RANGE
+        nearby = []
+        for (sx, sy), (vx, vy) in shells:
+            dx = sx - x
+            dy = sy - y
+            distance_sq = dx * dx + dy * dy
+            if distance_sq < range_sq:
+                nearby.append((distance_sq, dx, dy, vx, vy))
+        nearby.sort()
+        return nearby[:MAX_SHELLS]
+
+    def render(self):
+        # Draws the current state and returns it as a (height, width, 3) array
+        if self.screen is None:
+            pygame.display.init()
+            self.screen = pygame.display.set_mode((self.game.width, self.game.height))
+            self.game.screen = self.screen
+        self.game.renderer.invalidate()
+        self.game.draw()
+        return pygame.surfarray.array3d(self.screen).swapaxes(0, 1)
+
+
+def _env_worker(connection, buffers, num_envs, observation_size, first, env_options):
+    blocks = [shared_memory.SharedMemory(name=name) for name in buffers]
+    observations, actions, rewards, terminated, truncated = _shared_arrays(blocks, num_envs, observation_size)
+    envs = [TankEnv(observation=observations[first + i], **options) for i, options in enumerate(env_options)]
+    last = first + len(envs)
+    try:
+        while True:
+            command = connection.recv()
+            if command == 'step':
+                results = []
+                for env, action in zip(envs, actions[first:last].tolist()):
+                    _, reward, done, cut, _ = env.step(action)
+                    results.append((reward, done, cut))
+                    if done or cut:
+                        env.reset()  # The returned observation starts the next episode
+                rewards[first:last], terminated[first:last], truncated[first:last] = zip(*results)
+            elif command == 'reset':
+                for env in envs:
+                    env.reset()
+            elif command == 'close':
+                break
+            connection.send(None)
+    finally:
+        del observations, actions, rewards, terminated, truncated
+        for block in blocks:
+            block.close()
+
+
+def _shared_arrays(blocks, num_envs, observation_size):
+    return (np.ndarray((num_envs, observation_size), np.float32, blocks[0].buf),
+            np.ndarray((num_envs, len(ACTION_NVEC)), np.int8, blocks[1].buf),
+            np.ndarray(num_envs, np.float32, blocks[2].buf),
+            np.ndarray(num_envs, np.bool_, blocks[3].buf),
+            np.ndarray(num_envs, np.bool_, blocks[4].buf))
+
+
+# Steps num_envs TankEnvs in worker processes, several per worker. Actions,
+# observations, rewards and done flags live in shared memory; the pipes only
+# carry one short command and one acknowledgement per worker per step.
+# Finished episodes reset automatically.
+class VectorTankEnv:
+    def __init__(self, num_envs, workers=None, seed=0, **env_options):
+        self.num_envs = num_envs
+        workers = min(num_envs, workers or multiprocessing.cpu_count())
+        self.observation_size = TANK_FEATURES * (1 + env_options.get('enemy_count', 1)) + SHELL_FEATURES * MAX_SHELLS
+        sizes = (num_envs * self.observation_size * 4, num_envs * len(ACTION_NVEC), num_envs * 4,
+                 num_envs, num_envs)
+        self.blocks = [shared_memory.SharedMemory(create=True, size=size) for size in sizes]
+        (self.observations, self.actions, self.rewards,
+         self.terminated, self.truncated) = _shared_arrays(self.blocks, num_envs, self.observation_size)
+
+        self.connections = []
+        self.processes = []
+        names = [block.name for block in self.blocks]
+        for worker in range(workers):
+            first = num_envs * worker // workers
+            last = num_envs * (worker + 1) // workers
+            options = [dict(env_options, seed=seed + index) for index in range(first, last)]
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_env_worker, args=(child, names, num_envs, self.observation_size, first, options),
+                daemon=True)
+            process.start()
+            # The worker has its own copy; without closing ours, a dead worker never reads as EOF
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+    def _broadcast(self, command):
+        for connection in self.connections:
+            connection.send(command)
+        for connection in self.connections:
+            connection.recv()
+
+    def reset(self):
+        self._broadcast('reset')
+        return self.observations
+
+    def step(self, actions):
+        # actions: (num_envs, 4) integers. Returns (observations, rewards,
+        # terminated, truncated), views into shared memory valid until the next step.
+        self.actions[:] = actions
+        self._broadcast('step')
+        return self.observations, self.rewards, self.terminated, self.truncated
+
+    def close(self):
+        for connection in self.connections:
+            connection.send('close')
+        for process in self.processes:
+            process.join()
+        del self.observations, self.actions, self.rewards, self.terminated, self.truncated
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+
+
+def random_actions(rng, count):
+    return np.stack([rng.integers(0, n, count) for n in ACTION_NVEC], axis=1).astype(np.int8)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Environment steps per second with random actions")
+    parser.add_argument('--envs', type=int, default=1, help="environments; more than one runs them in worker processes")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes, one per CPU by default")
+    parser.add_argument('--steps', type=int, default=10000, help="steps per environment")
+    parser.add_argument('--frame-skip', type=int, default=1, help="simulation ticks per step")
+    parser.add_argument('--seed', type=int, default=0, help="random seed")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    episodes = 0
+    if args.envs == 1:
+        env = TankEnv(seed=args.seed, frame_skip=args.frame_skip)
+        env.reset()
+        start = time.perf_counter()
+        for action in random_actions(rng, args.steps):
+            _, _, terminated, truncated, _ = env.step(action)
+            if terminated or truncated:
+                episodes += 1
+                env.reset()
+    else:
+        env = VectorTankEnv(args.envs, args.workers, seed=args.seed, frame_skip=args.frame_skip)
+        env.reset()
+        start = time.perf_counter()
+        for _ in range(args.steps):
+            _, _, terminated, truncated = env.step(random_actions(rng, args.envs))
+            episodes += int(terminated.sum() + truncated.sum())
+        env.close()
+    elapsed = time.perf_counter() - start
+    total = args.envs * args.steps
+    print("{} steps in {:.2f} s: {:.0f} steps/s, {} episodes".format(total, elapsed, total / elapsed, episodes))
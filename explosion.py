@@ -1,40 +1,68 @@
 import pygame
-import os
+from assets import assets
+import timing
+from animation import FrameStrip
+from pool import Pool
+import resolution
 
 class Explosion:
-    def __init__(self, x, y):
-        self.position = pygame.math.Vector2(x, y)
-        self.creation_time = pygame.time.get_ticks()
+    GROWTH_DURATION = 200  # 0.2 seconds for growth animation
+    FRAME_RATE = 60
+    SPRITE_SCALE = 0.4  # At render scale 1
+    __slots__ = ('position', 'creation_time', 'duration', 'growth_duration')
+    frames = None  # Growth animation shared by all explosions
+    strips = {}  # Render scale -> growth animation, kept across scale changes
+
+    def __init__(self, x=0, y=0):
+        self.position = pygame.math.Vector2()
+        self.load_frames()
+        self.reset(x, y)
+
+    @classmethod
+    def spawn(cls, x, y):
+        explosion = cls.pool.acquire()
+        explosion.reset(x, y)
+        return explosion
+
+    def release(self):
+        self.pool.release(self)
+
+    def reset(self, x, y):
+        self.position.update(x, y)
+        self.creation_time = timing.get_ticks()
         self.duration = 300  # 2 seconds
-        self.growth_duration = 200  # 0.2 seconds for growth animation
-        
-        # Load and store original image
-        self.original_image = pygame.image.load(os.path.join('img', 'explosion.png'))
-        self.target_size = (
-            int(self.original_image.get_width() * 0.4),
-            int(self.original_image.get_height() * 0.4)
-        )
+        self.growth_duration = self.GROWTH_DURATION
+
+    @classmethod
+    def load_frames(cls):
+        # Set frames to None to pick them up again after the render scale changes
+        if cls.frames is None:
+            cls.frames = cls.strips.get(resolution.get_scale())
+        if cls.frames is None:
+            original_image = assets.image('explosion.png')
+            scale = cls.SPRITE_SCALE * resolution.get_scale()
+            target_size = (
+                int(original_image.get_width() * scale),
+                int(original_image.get_height() * scale)
+            )
+            cls.frames = FrameStrip.growth(original_image, target_size,
+                                           cls.GROWTH_DURATION, cls.FRAME_RATE)
+            cls.strips[resolution.get_scale()] = cls.frames
+        return cls.frames
 
     def should_remove(self):
-        return pygame.time.get_ticks() - self.creation_time > self.duration
-
-    def draw(self, screen):
-        current_time = pygame.time.get_ticks()
-        time_alive = current_time - self.creation_time
-        
-        # Calculate current scale based on growth animation
-        if time_alive < self.growth_duration:
-            scale = time_alive / self.growth_duration
-        else:
-            scale = 1.0
-            
-        # Calculate current size
-        current_size = (
-            int(self.target_size[0] * scale),
-            int(self.target_size[1] * scale)
-        )
-        
-        # Scale image to current size
-        scaled_image = pygame.transform.scale(self.original_image, current_size)
-        explosion_rect = scaled_image.get_rect(center=self.position)
-        screen.blit(scaled_image, explosion_rect)
\ No newline at end of file
+        return timing.get_ticks() - self.creation_time > self.duration
+
+    def draw(self, screen, camera=None):
+        time_alive = timing.get_ticks() - self.creation_time
+        image = self.frames.frame_at(time_alive)
+        position = self.position
+        if camera is not None:
+            position = camera.to_screen(position[0], position[1])
+            if not camera.sees(position[0], position[1], max(image.get_size()) // 2):
+                return None
+        explosion_rect = image.get_rect(center=position)
+        return screen.blit(image, explosion_rect)
+
+
+Explosion.pool = Pool(Explosion)
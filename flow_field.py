@@ -0,0 +1,123 @@
+import heapq
+import math
+
+
+# Flow fields over the wrapping battlefield. Each field leads every cell
+# toward one goal tank along the cheapest path, where paths may cross the
+# screen edges and cells holding other tanks cost extra. Fields are shared:
+# all AI tanks hunting the same opponent read one field, so the cost of
+# navigation depends on the number of goals, not on the number of tanks.
+class FlowFields:
+    OCCUPIED_COST = 6  # Extra cost of driving through a cell with a tank in it
+    MAX_CELLS = 600  # Large worlds get coarser cells so a field stays cheap to integrate
+
+    def __init__(self, width, height, cell_size=80, period=15, max_fields=8):
+        cell_size = max(cell_size, math.sqrt(width * height / self.MAX_CELLS))
+        self.width = width
+        self.height = height
+        self.cols = max(1, int(width // cell_size))
+        self.rows = max(1, int(height // cell_size))
+        self.cell_width = width / self.cols
+        self.cell_height = height / self.rows
+        self.period = period  # Ticks between recomputations
+        self.max_fields = max_fields  # Goals beyond this fall back to straight steering
+        self.fields = {}  # Goal tank -> ((goal cell, occupied cells), (x, y) unit vectors per cell)
+        self.computed = 0
+        self.neighbours = self._neighbours()
+
+    def _neighbours(self):
+        # Per cell: (neighbour index, step cost, unit x, unit y), wrapping at the edges
+        neighbours = []
+        for row in range(self.rows):
+            for col in range(self.cols):
+                cell = []
+                for dr in (-1, 0, 1):
+                    for dc in (-1, 0, 1):
+                        if dr == 0 and dc == 0:
+                            continue
+                        index = (row + dr) % self.rows * self.cols + (col + dc) % self.cols
+                        dx = dc * self.cell_width
+                        dy = dr * self.cell_height
+                        length = math.hypot(dx, dy)
+                        cell.append((index, length / self.cell_width, dx / length, dy / length))
+                neighbours.append(cell)
+        return neighbours
+
+    def index(self, x, y):
+        return (int(y // self.cell_height) % self.rows * self.cols +
+                int(x // self.cell_width) % self.cols)
+
+    def update(self, tanks, tick):
+        # Recompute the fields of the goals AI tanks are hunting, once per period
+        if tick % self.period:
+            return
+        demand = {}
+        for tank in tanks:
+            ai = tank.ai
+            if ai is not None and ai.hunting and ai.opponent is not None and tank.health > 0:
+                demand[ai.opponent] = demand.get(ai.opponent, 0) + 1
+        goals = sorted(demand, key=demand.get, reverse=True)[:self.max_fields]
+
+        occupied_cells = frozenset(self.index(tank.position.x, tank.position.y) for tank in tanks)
+        occupied = None
+        fields = {}
+        for goal in goals:
+            # A field only changes when its goal or some tank moves to another cell
+            key = (self.index(goal.position.x, goal.position.y), occupied_cells)
+            field = self.fields.get(goal)
+            if field is None or field[0] != key:
+                if occupied is None:
+                    occupied = [0] * (self.cols * self.rows)
+                    for index in occupied_cells:
+                        occupied[index] = self.OCCUPIED_COST
+                field = (key, self.integrate(key[0], occupied))
+                self.computed += 1
+            fields[goal] = field
+        self.fields = fields
+
+    def integrate(self, goal, occupied):
+        # Dijkstra outward from the goal; each cell points at the neighbour it was reached from
+        count = self.cols * self.rows
+        cost = [math.inf] * count
+        flow_x = [0.0] * count
+        flow_y = [0.0] * count
+        cost[goal] = 0.0
+        heap = [(0.0, goal)]
+        neighbours = self.neighbours
+        while heap:
+            distance, cell = heapq.heappop(heap)
+            if distance > cost[cell]:
+                continue
+            entry = 0 if cell == goal else occupied[cell]
+            for other, step, ux, uy in neighbours[cell]:
+                new_cost = distance + step + entry
+                if new_cost < cost[other]:
+                    cost[other] = new_cost
+                    # From other, the way to go is back toward cell
+                    flow_x[other] = -ux
+                    flow_y[other] = -uy
+                    heapq.heappush(heap, (new_cost, other))
+        return flow_x, flow_y
+
+    def heading(self, goal, x, y):
+        # Steering angle at (x, y) in Tank.body_angle degrees, blended
+        # between the four nearest cell centres; None without a field
+        field = self.fields.get(goal)
+        if field is None:
+            return None
+        flow_x, flow_y = field[1]
+        fx = x / self.cell_width - 0.5
+        fy = y / self.cell_height - 0.5
+        col = math.floor(fx)
+        row = math.floor(fy)
+        tx = fx - col
+        ty = fy - row
+        vx = vy = 0.0
+        for dc, dr, weight in ((0, 0, (1 - tx) * (1 - ty)), (1, 0, tx * (1 - ty)),
+                               (0, 1, (1 - tx) * ty), (1, 1, tx * ty)):
+            index = (row + dr) % self.rows * self.cols + (col + dc) % self.cols
+            vx += flow_x[index] * weight
+            vy += flow_y[index] * weight
+        if vx * vx + vy * vy < 1e-6:
+            return None  # At the goal
+        return -math.degrees(math.atan2(vy, vx))
@@ -0,0 +1,78 @@
+import pygame
+
+
+# Heads-up display: fixed health bars and banners are composited into one
+# cached overlay that is only repainted when their content changes
+class Hud:
+    def __init__(self):
+        self.overlay = None
+        self.elements = {}  # name -> (rect, state, paint) of each element on the overlay
+        self.text_cache = {}
+        self.bar_cache = {}
+        self.repaints = 0
+
+    def _ensure_overlay(self, size):
+        if self.overlay is None or self.overlay.get_size() != size:
+            self.overlay = pygame.Surface(size, pygame.SRCALPHA)
+            self.elements.clear()
+
+    def text(self, font, string, color):
+        # Rendered once per font, string and color
+        key = (font, string, color)
+        surface = self.text_cache.get(key)
+        if surface is None:
+            surface = font.render(string, True, color)
+            self.text_cache[key] = surface
+        return surface
+
+    def health_bar(self, tank, bar_width, bar_height):
+        # Shared bar surface for a given fill, redrawn only for new health values
+        fill_width = int((tank.health / tank.max_health) * bar_width)
+        key = (fill_width, bar_width, bar_height)
+        surface = self.bar_cache.get(key)
+        if surface is None:
+            surface = pygame.Surface((bar_width, bar_height), pygame.SRCALPHA)
+            tank.draw_health_bar(surface, 0, 0, bar_width, bar_height)
+            self.bar_cache[key] = surface
+        return surface
+
+    def _set(self, name, state, rect, paint):
+        current = self.elements.get(name)
+        if current is None and paint is None:
+            return
+        if current is not None and current[1] == state:
+            return
+        if current is not None:
+            old_rect = current[0]
+            self.overlay.fill((0, 0, 0, 0), old_rect)
+            del self.elements[name]
+            # Repaint anything else the cleared area cut into
+            for other_rect, _, other_paint in self.elements.values():
+                if other_rect.colliderect(old_rect):
+                    other_paint()
+        if paint is not None:
+            paint()
+            self.elements[name] = (rect, state, paint)
+        self.repaints += 1
+
+    def set_health_bar(self, name, tank, x, y, bar_width=200, bar_height=30):
+        surface = self.health_bar(tank, bar_width, bar_height)
+        rect = pygame.Rect(x, y, bar_width, bar_height)
+        self._set(name, (surface, rect.topleft), rect,
+                  lambda: self.overlay.blit(surface, rect))
+
+    def set_banner(self, name, font, string, color, center):
+        if string is None:
+            self._set(name, None, None, None)
+            return
+        surface = self.text(font, string, color)
+        rect = surface.get_rect(center=center)
+        self._set(name, (surface, rect.topleft), rect,
+                  lambda: self.overlay.blit(surface, rect))
+
+    def begin(self, size):
+        self._ensure_overlay(size)
+
+    def draw(self, screen):
+        # Composite the overlay only where it has content
+        return [screen.blit(self.overlay, rect, rect) for rect, _, _ in self.elements.values()]
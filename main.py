@@ -1,228 +1,887 @@
 import pygame
 from tank import Tank
+from projectile import Projectile
+from projectile_store import ProjectileStore
 from explosion import Explosion
+from assets import assets
+from audio import audio
+from rotation_cache import rotations
+from collision_mask import masks
+from ai import AIController, AIScheduler
+from flow_field import FlowFields
+from spatial_grid import SpatialGrid
+from camera import Camera
+from background import ChunkedBackground
+from renderer import DirtyRectRenderer
+from hud import Hud
+from profiler import FrameProfiler
+from replay import Recorder, ReplayKeys
+from timing import SimClock
+from resolution import DynamicResolution
+import timing
+import resolution
 import os
 import random
+import argparse
+import time
+
+STARTED = time.perf_counter()  # For the time-to-first-frame report
 
 class Game:
-    def __init__(self):
-        pygame.init()
-        pygame.mixer.init()  # Initialize sound system
-        self.screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
-        self.width, self.height = self.screen.get_size()
-        pygame.display.set_caption("Tank Battle")
+    REFERENCE_RATE = 240  # Motion constants are per step at this rate
+    MAX_FRAME_TIME = 250  # Clamp long frames (ms) to avoid a spiral of catch-up ticks
+    HEADLESS_SIZE = (1920, 1080)
+
+    def __init__(self, tick_rate=60, fps_cap=144, vsync=False, headless=False, clock=None,
+                 vectorized_projectiles=False, enemy_count=1, free_for_all=False,
+                 dirty_rects=True, profile=False, profile_csv=None, size=None, seed=None,
+                 autoplay=None, record_path=None, replay=None, remote_players=0,
+                 ai_decision_rate=10, ai_budget_ms=2.0, flow_field=True, world_size=None,
+                 render_size=None, scaling='nearest', dynamic_resolution=False, frame_budget_ms=None,
+                 pixel_collision=False, soak_log=None, soak_interval=60.0,
+                 soak_trace=True):
+        self.headless = headless
+        self.size = size  # Window size, the full screen when None; also the headless world size
+        # Internal resolution drawn into and scaled to the display, the display's own when None.
+        # 'nearest' and 'smooth' scale on the CPU, 'sdl' lets the SDL renderer do it (SCALED).
+        self.render_size = render_size
+        self.scaling = scaling
+        if dynamic_resolution and (render_size is None or scaling == 'sdl'):
+            raise ValueError("dynamic resolution needs a render size and CPU scaling")
+        if headless:
+            # No window and no audio device; only fonts are needed
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
+            os.environ['SDL_AUDIODRIVER'] = 'dummy'
+            pygame.font.init()
+        else:
+            pygame.init()
+            pygame.mixer.init()  # Initialize sound system
+
+        # Timing settings
+        self.tick_rate = tick_rate  # Simulation updates per second
+        self.tick_ms = 1000 / tick_rate
+        self.dt = self.REFERENCE_RATE / tick_rate  # Reference steps per tick
+        self.fps_cap = fps_cap  # 0 renders as fast as possible
+        self.vsync = vsync
+        self.clock = pygame.time.Clock()
+        self.first_frame_time = None  # perf_counter() of the first presented frame
+        self.assets_loaded_time = None
+
+        # Game timers read simulated time, which advances one tick per update
+        self.sim_clock = clock or SimClock()
+        timing.set_clock(self.sim_clock)
+        self.ticks = 0
+
+        if headless:
+            self.display = self.screen = None
+            self.width, self.height = world_size or size or self.HEADLESS_SIZE
+            self.base_zoom = 1.0
+        else:
+            self.display = self.create_screen()
+            if render_size and scaling == 'sdl':
+                output_size = size or pygame.display.get_desktop_sizes()[0]
+            else:
+                output_size = self.display.get_size()
+            self.width, self.height = world_size or output_size
+            # Render pixels per world pixel at the full internal resolution; the view
+            # covers the same part of the world whatever the internal resolution
+            self.base_zoom = render_size[1] / output_size[1] if render_size else 1.0
+            pygame.display.set_caption("Tank Battle")
+        self.zoom = self.base_zoom
+        resolution.set_scale(self.zoom)
+        self.screen = self.create_render_target(1.0)
+        self.dynamic_resolution = None
+        if dynamic_resolution:
+            budget = frame_budget_ms or 1000 / (fps_cap or 60)
+            self.dynamic_resolution = DynamicResolution(budget)
+        # width and height are the world; a larger world than the screen scrolls with the camera
+        self.camera = Camera(self.width, self.height)
+        self.focus_index = 0  # Tank the camera follows
+        self.background = ChunkedBackground(self.width, self.height, seed or 0)
+        self.load_assets()
+        audio.init()
+
+        # Only redraw and present the areas that changed, unless disabled
+        self.renderer = DirtyRectRenderer(background=self.draw_background, enabled=dirty_rects)
+        self.hud = Hud()
+
+        # Per-phase timings; also enabled by TANK_PROFILE / TANK_PROFILE_CSV, F3 toggles the overlay
+        self.profiler = FrameProfiler.from_environment(profile, profile_csv)
+        # Memory and resource samples for long unattended runs, checked for growth every
+        # round; tracemalloc adds the allocating lines but slows the simulation several times
+        self.soak = None
+        if soak_log:
+            # Only soak runs import the monitor
+            from soak import SoakMonitor
+            self.soak = SoakMonitor(soak_log, soak_interval, trace=soak_trace)
 
         # Debug settings
         self.DRAW_ENEMY_TANK_DESTINATION = False
+
+        # Rotation cache settings
+        self.ROTATION_STEP = 1.0  # Angle quantization in degrees
+        self.ROTATION_CACHE_BYTES = 64 * 1024 * 1024
+        self.WARM_ROTATION_CACHE = False  # Pre-rotate all sprites at startup
+        rotations.configure(step=self.ROTATION_STEP, max_bytes=self.ROTATION_CACHE_BYTES)
+        if self.WARM_ROTATION_CACHE:
+            self.warm_rotation_cache()
         
-        # Create two tanks with different sprites
-        self.player_tank = Tank(300, 300, 'tank.png', 'turret.png')
-        self.enemy_tank = Tank(self.width - 300, self.height - 300, 
-                             'tank2.png', 'turret2.png')
-        self.enemy_tank.body_angle = 180
+        # Roster settings
+        self.enemy_count = enemy_count  # AI tanks besides the player
+        self.free_for_all = free_for_all  # Every tank on its own team
+        # By default the player tank is driven by AI too in headless mode
+        self.autoplay = headless if autoplay is None else autoplay
+        # The first enemies take their controls from the network instead of AI
+        self.remote_keys = [ReplayKeys() for _ in range(remote_players)]
+        self.network = None  # NetServer that fills remote_keys and sends snapshots
+        # Attribute overrides applied to every new tank, e.g. for balance sweeps
+        self.tank_params = {}
+        self.tank_hit_radius = 40  # Collision detection radius for tanks
+        self.tank_collision_distance = 100  # Tanks closer than this push each other
+        # Hits need overlapping sprite masks; the circle tests above only pick the candidates
+        self.pixel_collision = pixel_collision
+        self.tank_grid = SpatialGrid(self.tank_hit_radius * 2, self.width, self.height)
+
+        # Seed the shared RNG so the match can be reproduced; recordings always need a seed
+        if seed is None and record_path:
+            seed = random.randrange(2 ** 63)
+        if seed is not None:
+            random.seed(seed)
+        self.seed = seed
+        self.vectorized_projectiles = vectorized_projectiles
+        self.round_results = []  # (result, tick) of every finished round
+        self.replay = replay
+        self.ai_decision_rate = ai_decision_rate
+        # AI decisions run ai_decision_rate times a second per tank. The wall-clock
+        # budget only applies to live play, headless and replayed runs must be reproducible.
+        live = not headless and record_path is None and replay is None
+        # Hunting tanks share one flow field per opponent, recomputed 4 times a second
+        self.flow_fields = FlowFields(self.width, self.height, period=max(1, tick_rate // 4)) if flow_field else None
+        self.ai_scheduler = AIScheduler(tick_rate, ai_decision_rate, budget_ms=ai_budget_ms if live else None,
+                                        flow_fields=self.flow_fields)
+        self.recorder = Recorder(record_path, seed, self) if record_path else None
+        self.tanks = []
+        # RNG state of the opening round, so it can be rebuilt to time a restart
+        self.opening_rng_state = random.getstate()
+        self.create_tanks()
+        self.restart_ms = 0.0  # How long the last reset_game took
         
-        self.projectiles = []
+        # Shells live either in a list of Projectile objects or in a numpy-backed store
+        self.projectiles = self.create_projectiles()
         self.explosions = []
-        self.tank_hit_radius = 40  # Collision detection radius for tanks
         self.victory_start_time = 0
         self.victory_duration = 3000  # 3 seconds in milliseconds
-        self.victory_font = pygame.font.Font(os.path.join('fonts', 'army_rust.ttf'), 250)
+        self.banner_fonts = {}  # Pixel size -> Font
+        self.victory_font = self.load_banner_font()
         self.show_victory = False
         self.game_over_start_time = 0
         self.game_over_duration = 3000  # 3 seconds
         self.show_game_over = False
-        self.enemy_target = pygame.math.Vector2(
-            random.randint(0, self.width),
-            random.randint(0, self.height)
-        )
-        self.enemy_next_shot = pygame.time.get_ticks() + random.randint(2000, 10000)
+        # Sprites, frame strips and fonts of every dynamic resolution level are
+        # built now, so a step during the match only swaps them in
+        if self.dynamic_resolution is not None:
+            for fraction in reversed(DynamicResolution.LEVELS):
+                self.set_render_scale(fraction)
+        self.startup_asset_stats = assets.stats()
+
+    def render_scales(self):
+        # Every render scale the match can use, and scale 1 for the collision masks
+        fractions = DynamicResolution.LEVELS if self.dynamic_resolution is not None else (1.0,)
+        scales = [self.base_zoom * fraction for fraction in fractions]
+        if 1.0 not in scales:
+            scales.append(1.0)
+        return scales
+
+    def load_assets(self):
+        # Sprites and sounds decode on a worker thread behind a loading screen;
+        # only the surface conversion runs here
+        if self.headless:
+            assets.preload(self.render_scales())
+            return
+        loader = assets.preload_async(self.render_scales())
+        font = pygame.font.Font(os.path.join('fonts', 'army_rust.ttf'), 80)
+        label = font.render("LOADING", True, (255, 0, 0))
+        while loader.is_alive():
+            pygame.event.pump()
+            self.draw_loading_screen(label, assets.preload_progress())
+            if self.first_frame_time is None:
+                self.first_frame_time = time.perf_counter()
+            loader.join(1 / 30)
+        assets.finish_preload()
+        self.assets_loaded_time = time.perf_counter()
+
+    def draw_loading_screen(self, label, progress):
+        # Straight to the display, before there is anything to upscale
+        self.display.fill((0, 0, 0))
+        center = self.display.get_rect().center
+        self.display.blit(label, label.get_rect(center=center))
+        bar = pygame.Rect(0, 0, self.display.get_width() // 3, 20)
+        bar.midtop = (center[0], center[1] + label.get_height())
+        pygame.draw.rect(self.display, (128, 128, 128), bar)
+        pygame.draw.rect(self.display, (255, 0, 0), (bar.x, bar.y, int(bar.width * progress), bar.height))
+        pygame.display.flip()
+
+    def create_screen(self):
+        if self.render_size and self.scaling == 'sdl':
+            # The window or full screen shows the internal resolution, scaled by the SDL renderer
+            flags = pygame.SCALED if self.size else pygame.SCALED | pygame.FULLSCREEN
+            return pygame.display.set_mode(self.render_size, flags, vsync=1 if self.vsync else 0)
+        if self.size:
+            # A fixed size (e.g. from a replay) opens a window instead of going full screen
+            return pygame.display.set_mode(self.size, vsync=1 if self.vsync else 0)
+        if self.vsync:
+            # vsync is only honoured by the SDL renderer, which needs SCALED
+            try:
+                size = pygame.display.get_desktop_sizes()[0]
+                return pygame.display.set_mode(size, pygame.FULLSCREEN | pygame.SCALED, vsync=1)
+            except pygame.error:
+                self.vsync = False
+        return pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+
+    def create_render_target(self, fraction):
+        # The surface the game draws into: the display itself, or an offscreen
+        # surface at a fraction of the internal resolution
+        if self.display is None or self.render_size is None or self.scaling == 'sdl':
+            return self.display
+        width, height = self.render_size
+        size = (max(1, round(width * fraction)), max(1, round(height * fraction)))
+        return pygame.Surface(size).convert()
+
+    def set_render_scale(self, fraction):
+        # Switches the internal resolution; sprites and fonts are rebuilt at the new scale
+        self.screen = self.create_render_target(fraction)
+        self.zoom = self.base_zoom * fraction
+        resolution.set_scale(self.zoom)
+        Tank.death_fire_frames = None
+        for tank in self.tanks:
+            tank.load_images()
+        Projectile.load_image()
+        if self.vectorized_projectiles:
+            self.projectiles.image = Projectile.image
+        Explosion.frames = None
+        Explosion.load_frames()
+        self.victory_font = self.load_banner_font()
+        self.renderer.invalidate()
+
+    def load_banner_font(self):
+        # One Font per pixel size: the HUD caches text per Font object, so
+        # switching back to an earlier scale reuses its banners
+        size = resolution.scaled(250)
+        font = self.banner_fonts.get(size)
+        if font is None:
+            font = pygame.font.Font(os.path.join('fonts', 'army_rust.ttf'), size)
+            self.banner_fonts[size] = font
+        return font
+
+    def upscale(self):
+        # One scale of the whole internal frame into the display
+        if self.scaling == 'smooth':
+            pygame.transform.smoothscale(self.screen, self.display.get_size(), self.display)
+        else:
+            pygame.transform.scale(self.screen, self.display.get_size(), self.display)
+
+    def present(self):
+        if self.screen is self.display:
+            self.renderer.present(self.screen)
+        else:
+            self.renderer.present(self.screen, self.upscale)
+
+    def warm_rotation_cache(self):
+        for name in ('tank.png', 'tank2.png', 'turret.png', 'turret2.png', 'fire.png'):
+            rotations.warm(assets.image(name, scale=Tank.SPRITE_SCALE * resolution.get_scale()))
+        rotations.warm(assets.image('shell.png', scale=Projectile.SHELL_SCALE * resolution.get_scale(), flip_y=True))
+
+    def create_tanks(self):
+        # The player is always first in the roster, enemies use the second sprite.
+        # Tanks from the last round are reset in place while the roster size holds.
+        if len(self.tanks) != self.enemy_count + 1:
+            self.tanks = [Tank(300, 300, 'tank.png', 'turret.png')]
+            self.tanks += [Tank(0, 0, 'tank2.png', 'turret2.png') for _ in range(self.enemy_count)]
+        self.player_tank = self.tanks[0]
+        self.player_tank.reset(300, 300)
+        for i, tank in enumerate(self.tanks[1:]):
+            if i == 0:
+                x, y = self.width - 300, self.height - 300
+            else:
+                x, y = random.randint(0, self.width), random.randint(0, self.height)
+            tank.reset(x, y)
+            tank.body_angle = 180
+            tank.team = i + 1 if self.free_for_all else 1
+        self.player_tank.sound_priority = 1
+        # First enemy, shown in the top-right health bar of a duel
+        self.enemy_tank = self.tanks[1]
+
+        for index, tank in enumerate(self.tanks):
+            for name, value in self.tank_params.items():
+                setattr(tank, name, value)
+            if index == 0 and not self.autoplay or 0 < index <= len(self.remote_keys):
+                tank.ai = None
+            elif tank.ai is None:
+                tank.ai = AIController(self.width, self.height, tank.shot_cooldown)
+            else:
+                tank.ai.reset(tank.shot_cooldown)
+        self.update_tank_grid()
+
+    def create_projectiles(self):
+        if self.vectorized_projectiles:
+            return ProjectileStore()
+        return []
+
+    def release_entities(self):
+        # Hand every live shell, explosion and fire burst back to its pool
+        if not self.vectorized_projectiles:
+            Projectile.pool.release_all(self.projectiles)
+        Explosion.pool.release_all(self.explosions)
+        for tank in self.tanks:
+            tank.release_death_fires()
+            tank.stop_sounds()
 
     def reset_game(self):
-        self.player_tank = Tank(300, 300, 'tank.png', 'turret.png')
-        self.enemy_tank = Tank(self.width - 300, self.height - 300, 
-                             'tank2.png', 'turret2.png')
-        self.enemy_tank.body_angle = 180
-        self.projectiles = []
-        self.explosions = []
+        started = time.perf_counter()
+        self.release_entities()
+        self.create_tanks()
+        self.ai_scheduler.reset()
+        self.projectiles.clear()
+        self.explosions.clear()
         self.show_victory = False
         self.show_game_over = False
+        self.restart_ms = (time.perf_counter() - started) * 1000
+        if self.soak is not None:
+            self.soak.round_start(self)
 
-    def draw_victory_message(self):
-        if not self.show_victory:
-            return
-            
-        current_time = pygame.time.get_ticks()
-        if current_time - self.victory_start_time > self.victory_duration:
-            self.reset_game()
-            return
-            
-        text = self.victory_font.render("VICTORY", True, (255, 0, 0))
-        text_rect = text.get_rect(center=(self.width // 2, self.height // 2))
-        self.screen.blit(text, text_rect)
+    def measure_round_restart(self):
+        # Rebuild the opening round from its RNG state: the reset gets timed
+        # and the match that follows is exactly the one __init__ set up
+        random.setstate(self.opening_rng_state)
+        self.reset_game()
+        return self.restart_ms
 
-    def draw_game_over_message(self):
-        if not self.show_game_over:
-            return
-            
-        current_time = pygame.time.get_ticks()
-        if current_time - self.game_over_start_time > self.game_over_duration:
+    def update_round(self):
+        # Start a new round once the victory or game over message has been shown
+        current_time = timing.get_ticks()
+        if self.show_victory and current_time - self.victory_start_time > self.victory_duration:
             self.reset_game()
-            return
-            
-        text = self.victory_font.render("GAME OVER", True, (255, 0, 0))
-        text_rect = text.get_rect(center=(self.width // 2, self.height // 2))
-        self.screen.blit(text, text_rect)
+        elif self.show_game_over and current_time - self.game_over_start_time > self.game_over_duration:
+            self.reset_game()
+
+    def update_banner(self):
+        # The banner text is rendered once and stays on the HUD overlay
+        if self.show_victory:
+            message = "VICTORY"
+        elif self.show_game_over:
+            message = "GAME OVER"
+        else:
+            message = None
+        self.hud.set_banner('banner', self.victory_font, message, (255, 0, 0),
+                            self.screen.get_rect().center)
+
+    def shell_hit_radius(self):
+        # Broadphase radius for shell hits, around the largest hull in the roster
+        if not self.pixel_collision:
+            return self.tank_hit_radius
+        return max(masks.radius(tank.hull_image) for tank in self.tanks) + masks.radius(Projectile.hit_image)
+
+    def shell_sure_radius(self):
+        # Shells closer than this to a tank's centre hit without a mask test, whichever tank it is
+        if not self.pixel_collision:
+            return 0
+        return min(masks.core_radius(tank.hull_image) for tank in self.tanks)
 
-    def check_projectile_collision(self, projectile):
-        # Check collision with both tanks
-        for tank in [self.player_tank, self.enemy_tank]:
+    def shell_hit_test(self):
+        # Narrow phase for this tick: narrow(x, y, shell angle, tank index) tells
+        # whether the shell and hull masks overlap; None without pixel collision
+        if not self.pixel_collision:
+            return None
+        # Hull masks are looked up once per tick, tanks do not move while shells do
+        hulls = [(masks.get(tank.hull_image, tank.body_angle + 90), tank.position.x, tank.position.y)
+                 for tank in self.tanks]
+        shell_image = Projectile.hit_image
+
+        def narrow(x, y, angle, index):
+            (hull, half_width, half_height), tank_x, tank_y = hulls[index]
+            shell, shell_half_width, shell_half_height = masks.get(shell_image, angle + 90)
+            offset = (round(x - shell_half_width - tank_x + half_width),
+                      round(y - shell_half_height - tank_y + half_height))
+            return hull.overlap(shell, offset) is not None
+        return narrow
+
+    def check_projectile_collision(self, projectile, radius, sure_radius, narrow=None):
+        # Check collision with tanks in nearby grid cells; the first tank
+        # in roster order takes the hit
+        x, y = projectile.position
+        hit = None
+        for index, tank in self.tank_grid.query(x, y, radius):
             distance = (tank.position - projectile.position).length()
-            if distance < self.tank_hit_radius:
-                tank.take_damage()
-                return True
+            if distance < radius and (hit is None or index < hit[0]):
+                if narrow is not None and distance >= sure_radius and not narrow(x, y, projectile.angle, index):
+                    continue
+                hit = (index, tank)
+        if hit:
+            hit[1].take_damage(projectile.owner)
+            return True
         return False
 
     def update_projectiles(self):
-        active_projectiles = []
-        for proj in self.projectiles:
-            if proj.update() and not self.check_projectile_collision(proj):
-                active_projectiles.append(proj)
+        if self.vectorized_projectiles:
+            self.update_projectile_store()
+            return
+        # Compact surviving shells to the front of the list in place
+        projectiles = self.projectiles
+        if not projectiles:
+            return
+        radius = self.shell_hit_radius()
+        sure_radius = self.shell_sure_radius()
+        narrow = self.shell_hit_test()
+        kept = 0
+        for proj in projectiles:
+            if proj.update(self.dt) and not self.check_projectile_collision(proj, radius, sure_radius, narrow):
+                projectiles[kept] = proj
+                kept += 1
             else:
                 # Create explosion at projectile's last position
-                self.explosions.append(Explosion(proj.position.x, proj.position.y))
-                proj.explosion_sound.play()  # Play sound when firing
-        self.projectiles = active_projectiles
+                self.explosions.append(Explosion.spawn(proj.position.x, proj.position.y))
+                audio.play('explosions', 'explosion.mp3', priority=1)
+                proj.release()
+        del projectiles[kept:]
+
+    def update_projectile_store(self):
+        tanks = self.tanks
+        positions, hits, owners = self.projectiles.update(
+            [(tank.position.x, tank.position.y) for tank in tanks], self.shell_hit_radius(), self.dt,
+            self.shell_hit_test(), self.shell_sure_radius())
+        if len(positions) == 0:
+            return
+        for (x, y), hit, owner in zip(positions.tolist(), hits.tolist(), owners.tolist()):
+            if hit >= 0:
+                tanks[hit].take_damage(owner)
+            # Create explosion at projectile's last position
+            self.explosions.append(Explosion.spawn(x, y))
+            audio.play('explosions', 'explosion.mp3', priority=1)
 
     def update_explosions(self):
-        self.explosions = [exp for exp in self.explosions if not exp.should_remove()]
+        explosions = self.explosions
+        kept = 0
+        for exp in explosions:
+            if exp.should_remove():
+                exp.release()
+            else:
+                explosions[kept] = exp
+                kept += 1
+        del explosions[kept:]
 
-    def draw_projectiles(self):
+    def draw_projectiles(self, alpha=1.0):
+        if self.vectorized_projectiles:
+            self.renderer.add(self.projectiles.draw(self.screen, alpha, self.camera))
+            return
         for projectile in self.projectiles:
-            projectile.draw(self.screen)
+            self.renderer.add(projectile.draw(self.screen, alpha, self.camera))
 
     def draw_explosions(self):
         for explosion in self.explosions:
-            explosion.draw(self.screen)
+            self.renderer.add(explosion.draw(self.screen, self.camera))
+
+    def update_tank_grid(self):
+        self.tank_grid.rebuild(((index, tank), tank.position.x, tank.position.y)
+                               for index, tank in enumerate(self.tanks))
 
     def check_tank_collision(self):
-        tank_distance = (self.player_tank.position - self.enemy_tank.position).length()
-        min_distance = 100
-        if tank_distance < min_distance:
-            # If either tank is dying (on fire), destroy the other tank
-            if self.player_tank.is_dying:
-                self.enemy_tank.health = 0
-                self.enemy_tank.start_death_sequence()
-            if self.enemy_tank.is_dying:
-                self.player_tank.health = 0
-                self.player_tank.start_death_sequence()
-
-            # Calculate collision direction and strength
-            direction = (self.player_tank.position - self.enemy_tank.position).normalize()
-            push_strength = 0.9
-            
-            # Apply regular collision damage only if tanks aren't dying
-            if not (self.player_tank.is_dying or self.enemy_tank.is_dying):
-                self.player_tank.take_collision_damage()
-                self.enemy_tank.take_collision_damage()
-            
-            # Apply push to both tanks
-            self.enemy_tank.apply_push(-direction, push_strength)
-            self.player_tank.apply_push(direction, push_strength)
-            return True
-        return False
+        # Broadphase: only pairs sharing nearby grid cells are tested
+        min_distance = self.tank_collision_distance
+        sure_distance = 0
+        query_distance = min_distance
+        if self.pixel_collision:
+            # Each pair is measured with its own hulls, the query covers the two largest
+            query_distance = 2 * max(masks.radius(tank.hull_image) for tank in self.tanks)
+        collided = False
+        for index, tank in enumerate(self.tanks):
+            for other_index, other in self.tank_grid.query(tank.position.x, tank.position.y, query_distance):
+                if other_index <= index:
+                    continue
+                if self.pixel_collision:
+                    min_distance = masks.radius(tank.hull_image) + masks.radius(other.hull_image)
+                    sure_distance = masks.core_radius(tank.hull_image) + masks.core_radius(other.hull_image)
+                # Tanks wrap around the screen, so measure across the edges too
+                dx, dy = self.tank_grid.wrapped_delta(tank.position, other.position)
+                distance_sq = dx * dx + dy * dy
+                if distance_sq >= min_distance * min_distance:
+                    continue
+                if (self.pixel_collision and distance_sq >= sure_distance * sure_distance and
+                        not masks.overlap(other.hull_image, other.body_angle + 90, 0, 0,
+                                          tank.hull_image, tank.body_angle + 90, dx, dy)):
+                    continue
+                self.collide_tanks(tank, other, pygame.math.Vector2(dx, dy))
+                collided = True
+        return collided
+
+    def collide_tanks(self, tank, other, offset):
+        # If either tank is dying (on fire), destroy the other tank
+        if tank.is_dying:
+            other.health = 0
+            other.start_death_sequence()
+        if other.is_dying:
+            tank.health = 0
+            tank.start_death_sequence()
+
+        # Calculate collision direction and strength
+        if offset.length_squared() == 0:
+            return
+        direction = offset.normalize()
+        push_strength = 0.9
+        
+        # Apply regular collision damage only if tanks aren't dying
+        if not (tank.is_dying or other.is_dying):
+            tank.take_collision_damage()
+            other.take_collision_damage()
+        
+        # Apply push to both tanks
+        other.apply_push(-direction, push_strength)
+        tank.apply_push(direction, push_strength)
 
-    def update_enemy(self):
-         # Update enemy movement
-        if self.enemy_tank.move_to_target(self.enemy_target):
-            # Keep generating new points until we find one far enough
-            while True:
-                new_target = pygame.math.Vector2(
-                    random.randint(0, self.width),
-                    random.randint(0, self.height)
-                )
-                # Check if the new point is far enough from current position
-                if (new_target - self.enemy_tank.position).length() >= 500:
-                    self.enemy_target = new_target
-                    break
-
-        self.enemy_tank.aim_turret_at(self.player_tank.position)
-
-        # Handle enemy shooting
-        current_time = pygame.time.get_ticks()
-        if current_time >= self.enemy_next_shot and self.enemy_tank.health > 0:
-            new_projectile = self.enemy_tank.shoot()
+    def update_ai(self):
+        for projectile in self.ai_scheduler.update(self.tanks, self.dt):
+            self.projectiles.append(projectile)
+
+    def update(self, keys=None):
+        if self.replay is not None:
+            keys = self.replay.next_keys()
+            if self.replay.reset:
+                self.reset_game()
+        if self.recorder is not None:
+            self.recorder.record(keys)
+        self.sim_clock.advance(self.tick_ms)
+        self.ticks += 1
+        self.update_round()
+
+        for tank in self.tanks:
+            tank.save_state()
+
+        profiler = self.profiler
+        started = profiler.start()
+        if self.network is not None:
+            self.network.receive()
+        if self.player_tank.ai is None:
+            new_projectile = self.player_tank.handle_input(keys, self.dt)
             if new_projectile:
                 self.projectiles.append(new_projectile)
-            self.enemy_next_shot = current_time + random.randint(2000, 10000)
+        for tank, remote_keys in zip(self.tanks[1:], self.remote_keys):
+            new_projectile = tank.handle_input(remote_keys, self.dt)
+            if new_projectile:
+                self.projectiles.append(new_projectile)
+        started = profiler.lap('input', started)
+        
+        # Check and handle tank collisions
+        self.update_tank_grid()
+        self.check_tank_collision()
+        started = profiler.lap('check_tank_collision', started)
+            
+        self.update_projectiles()
+        started = profiler.lap('update_projectiles', started)
+        self.update_explosions()
+        started = profiler.lap('update_explosions', started)
+        for tank in self.tanks:
+            tank.update_position(self.width, self.height, self.dt)
+        
+        for tank in self.tanks:
+            tank.update_death_animation()
+        started = profiler.lap('update_tanks', started)
+
+        self.update_ai()
+        profiler.lap('update_ai', started)
+        
+        # Check for victory condition
+        player_team = self.player_tank.team
+        enemies_alive = any(tank.health > 0 for tank in self.tanks if tank.team != player_team)
+        if not enemies_alive and not self.show_victory and not self.show_game_over:
+            self.show_victory = True
+            self.victory_start_time = timing.get_ticks()
+            self.end_round("VICTORY")
+        if self.player_tank.health == 0 and not self.show_victory and not self.show_game_over:
+            self.show_game_over = True
+            self.game_over_start_time = timing.get_ticks()
+            self.end_round("GAME OVER")
+
+        audio.update(self.dt)
+        if self.network is not None:
+            self.network.send()
+        if self.soak is not None:
+            self.soak.tick(self)
+
+    def end_round(self, result):
+        self.round_results.append((result, self.ticks))
+        if self.recorder is not None:
+            self.recorder.mark_result(result, self.ticks)
+
+    def finish_recording(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def finish_soak(self):
+        if self.soak is not None:
+            self.soak.close()
+            print(self.soak.report())
+            self.soak = None
+
+    def draw_background(self, screen, rect):
+        if self.camera.follows:
+            self.background.draw(screen, self.camera, rect)
+        else:
+            screen.fill((0, 0, 0), rect)
+
+    def draw(self, alpha=1.0):
+        profiler = self.profiler
+        started = profiler.start()
+        # Scrolling moves everything on screen, so those frames are full redraws
+        focus, _, _ = self.tanks[self.focus_index].render_state(alpha)
+        self.camera.update(self.screen.get_size(), focus.x, focus.y, self.zoom)
+        if self.camera.moved:
+            self.renderer.invalidate()
+        self.renderer.begin(self.screen)
+        self.draw_enemy_destination()  # Add this line before health bars
+        for tank in self.tanks:
+            self.renderer.add(tank.draw_body(self.screen, alpha, self.camera))
+        started = profiler.lap('draw_tanks', started)
+        for tank in self.tanks:
+            self.renderer.add(tank.draw_turret(self.screen, alpha, self.camera))
+        started = profiler.lap('draw_turrets', started)
+        self.draw_projectiles(alpha)
+        started = profiler.lap('draw_projectiles', started)
+        self.draw_explosions()
+        started = profiler.lap('draw_explosions', started)
+        self.draw_health_bars()
+        self.update_banner()
+        self.renderer.add(self.hud.draw(self.screen))
+        self.renderer.add(profiler.draw_overlay(self.screen, self.clock.get_fps(), pygame.time.get_ticks()))
+        profiler.lap('draw_hud', started)
+
+    def draw_health_bars(self):
+        # Layout is given at render scale 1
+        scaled = resolution.scaled
+        self.hud.begin(self.screen.get_size())
+        self.hud.set_health_bar('player', self.player_tank, scaled(50), scaled(50), scaled(200), scaled(30))
+        if len(self.tanks) == 2:
+            self.hud.set_health_bar('enemy', self.enemy_tank, self.screen.get_width() - scaled(250), scaled(50),
+                                    scaled(200), scaled(30))
+            return
+        # Too many enemies for the corner, give each a small bar above it
+        for tank in self.tanks[1:]:
+            x, y = self.camera.to_screen(*tank.rect.center)
+            if not self.camera.sees(x, y, tank.CULL_RADIUS):
+                continue
+            bar = self.hud.health_bar(tank, scaled(60), scaled(6))
+            self.renderer.add(self.screen.blit(bar, (x - scaled(30), y - scaled(70))))
 
     def run(self):
+        restart_ms = self.measure_round_restart()
         running = True
+        accumulator = 0
+        self.clock.tick()  # Loading time is not simulation time
+        game_frames = 0
         while running:
+            # Sleeps to honour the FPS cap instead of spinning
+            frame_time = self.clock.tick(self.fps_cap)
+            accumulator += min(frame_time, self.MAX_FRAME_TIME)
+            self.profiler.begin_frame()
+            started = self.profiler.start()
+
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
+                elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    self.renderer.invalidate()
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    self.profiler.toggle_overlay()
 
             keys = pygame.key.get_pressed()
+            self.profiler.lap('input', started)
 
             if keys[pygame.K_ESCAPE]:
                 running = False
+            if self.replay is not None and self.replay.finished:
+                running = False
 
-            new_projectile = self.player_tank.handle_input(keys)
-            if new_projectile:
-                self.projectiles.append(new_projectile)
-            
-            # Check and handle tank collisions
-            self.check_tank_collision()
-                
-            self.update_projectiles()
-            self.update_explosions()
-            self.player_tank.update_position(self.width, self.height)
-            self.enemy_tank.update_position(self.width, self.height)
-
-            self.player_tank.handle_screen_wrap(self.width, self.height)
-            
-            self.player_tank.update_death_animation()
-            self.enemy_tank.update_death_animation()
+            # Run as many fixed simulation ticks as the elapsed time covers
+            while accumulator >= self.tick_ms:
+                self.update(keys)
+                accumulator -= self.tick_ms
 
-            self.update_enemy()
-            
-            # Check for victory condition
-            if self.enemy_tank.health == 0 and not self.show_victory and not self.show_game_over:
-                self.show_victory = True
-                self.victory_start_time = pygame.time.get_ticks()
-            if self.player_tank.health == 0 and not self.show_victory and not self.show_game_over:
-                self.show_game_over = True
-                self.game_over_start_time = pygame.time.get_ticks()
-            
-            self.screen.fill((0, 0, 0))
-            self.draw_enemy_destination()  # Add this line before health bars
-            self.player_tank.draw_body(self.screen)
-            self.enemy_tank.draw_body(self.screen)
-            self.player_tank.draw_turret(self.screen)
-            self.enemy_tank.draw_turret(self.screen)
-            self.draw_projectiles()
-            self.draw_explosions()
-            self.player_tank.draw_health_bar(self.screen, 50, 50)
-            self.enemy_tank.draw_health_bar(self.screen, self.width - 250, 50)
-            self.draw_victory_message()
-            self.draw_game_over_message()
-            pygame.display.flip()
+            self.draw(accumulator / self.tick_ms)
+            started = self.profiler.start()
+            self.present()
+            self.profiler.lap('present', started)
+            # Frame work without the FPS cap's sleep decides the internal resolution
+            if self.dynamic_resolution is not None and self.dynamic_resolution.update(self.clock.get_rawtime()):
+                self.set_render_scale(self.dynamic_resolution.fraction)
+            self.profiler.end_frame()
+            game_frames += 1
+            if game_frames == 1:
+                self.report_startup(restart_ms)
 
+        self.profiler.close()
+        self.finish_recording()
+        self.finish_soak()
+        self.report_asset_stats()
+        self.report_stats()
+        if self.dynamic_resolution is not None:
+            print("Resolution: {} changes, ended at {:.0%} of {}x{}".format(
+                self.dynamic_resolution.changes, self.dynamic_resolution.fraction, *self.render_size))
         pygame.quit()
 
+    def simulate(self, max_ticks=None):
+        # Play one match as fast as the CPU allows, without drawing
+        start_ticks = self.ticks
+        start_time = time.perf_counter()
+        while max_ticks is None or self.ticks - start_ticks < max_ticks:
+            self.update()
+            if self.show_victory or self.show_game_over:
+                break
+        elapsed = time.perf_counter() - start_time
+
+        if self.show_victory:
+            winner = 'player'
+        elif self.show_game_over:
+            winner = 'enemy'
+        else:
+            winner = None
+        ticks = self.ticks - start_ticks
+        enemies = self.tanks[1:]
+        return {
+            'winner': winner,
+            'ticks': ticks,
+            'player_shots_fired': self.player_tank.shots_fired,
+            'enemy_shots_fired': sum(tank.shots_fired for tank in enemies),
+            'player_shots_hit': sum(tank.hits_taken for tank in enemies),
+            'enemy_shots_hit': self.player_tank.hits_taken,
+            'sim_time_ms': ticks * self.tick_ms,
+            'wall_time_s': elapsed,
+            'ticks_per_second': ticks / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def run_headless(self, matches, max_ticks=None):
+        results = []
+        for _ in range(matches):
+            if self.recorder is not None:
+                self.recorder.mark_reset()
+            self.reset_game()
+            results.append(self.simulate(max_ticks))
+        return results
+
+    def report_startup(self, restart_ms):
+        now = time.perf_counter()
+        if self.first_frame_time is None:
+            self.first_frame_time = now
+        print("Startup: first frame {:.0f} ms, assets loaded {:.0f} ms, first game frame {:.0f} ms".format(
+            (self.first_frame_time - STARTED) * 1000,
+            ((self.assets_loaded_time or now) - STARTED) * 1000,
+            (now - STARTED) * 1000))
+        print("Round restart: {:.2f} ms".format(restart_ms))
+
+    def report_asset_stats(self):
+        stats = assets.stats()
+        # Source decodes, scaled variants and sprite cache reads alike
+        runtime_loads = sum(stats[kind] - self.startup_asset_stats[kind]
+                            for kind in ('image_loads', 'variant_loads', 'sound_loads'))
+        print("Assets: {image_loads} images, {variant_loads} scaled variants, {sound_loads} sounds loaded, "
+              "{disk_bytes} bytes read, {image_bytes} image bytes, "
+              "{sound_bytes} sound bytes".format(**stats))
+        print("Assets loaded after startup: {}".format(runtime_loads))
+        print("Audio: {plays} plays, {steals} voices stolen, {dropped} dropped".format(**audio.stats()))
+
+    def report_stats(self):
+        # Cache and scheduler counters, printed at exit; the drawing ones only if anything was drawn
+        if self.renderer.full_frames + self.renderer.partial_frames:
+            print("Rotation cache: {entries} entries, {bytes} bytes, {hits} hits, {misses} misses, "
+                  "{evictions} evictions".format(**rotations.stats()))
+            print("Renderer: {} full frames, {} partial frames".format(
+                self.renderer.full_frames, self.renderer.partial_frames))
+            print("Camera: {} sprites drawn, {} culled; background: {} chunks painted, {} evicted".format(
+                self.camera.drawn, self.camera.culled, self.background.renders, self.background.evictions))
+            print("HUD: {} overlay repaints, {} cached texts, {} cached bars".format(
+                self.hud.repaints, len(self.hud.text_cache), len(self.hud.bar_cache)))
+        print("AI: {} decisions, {} deferred to a later tick".format(
+            self.ai_scheduler.decisions, self.ai_scheduler.deferred))
+        if self.flow_fields is not None:
+            print("Flow fields: {} computed".format(self.flow_fields.computed))
+        if self.pixel_collision:
+            print("Collision masks: {entries} entries at {step} degree steps, {hits} hits, {misses} misses, "
+                  "{evictions} evictions".format(**masks.stats()))
+
     def draw_enemy_destination(self):
             if not self.DRAW_ENEMY_TANK_DESTINATION:
                 return
                 
-            # Draw a red cross at target position
+            # Draw a red cross at each AI tank's target position
             cross_size = 20
-            pygame.draw.line(self.screen, (255, 0, 0),
-                            (self.enemy_target.x - cross_size, self.enemy_target.y - cross_size),
-                            (self.enemy_target.x + cross_size, self.enemy_target.y + cross_size), 3)
-            pygame.draw.line(self.screen, (255, 0, 0),
-                            (self.enemy_target.x - cross_size, self.enemy_target.y + cross_size),
-                            (self.enemy_target.x + cross_size, self.enemy_target.y - cross_size), 3)
+            for tank in self.tanks[1:]:
+                if tank.ai is None:
+                    continue
+                target = pygame.math.Vector2(self.camera.to_screen(tank.ai.target.x, tank.ai.target.y))
+                self.renderer.add(pygame.draw.line(self.screen, (255, 0, 0),
+                                (target.x - cross_size, target.y - cross_size),
+                                (target.x + cross_size, target.y + cross_size), 3))
+                self.renderer.add(pygame.draw.line(self.screen, (255, 0, 0),
+                                (target.x - cross_size, target.y + cross_size),
+                                (target.x + cross_size, target.y - cross_size), 3))
 
 if __name__ == "__main__":
-    game = Game()
-    game.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Tank Battle")
+    parser.add_argument('--tick-rate', type=int, default=60, help="simulation ticks per second")
+    parser.add_argument('--fps-cap', type=int, default=144, help="maximum rendered frames per second, 0 for uncapped")
+    parser.add_argument('--vsync', action='store_true', help="synchronize presentation with the display")
+    parser.add_argument('--headless', action='store_true', help="simulate AI-vs-AI matches without a window or sound")
+    parser.add_argument('--matches', type=int, default=1, help="number of headless matches to play")
+    parser.add_argument('--max-ticks', type=int, default=None, help="end a headless match as a draw after this many ticks")
+    parser.add_argument('--seed', type=int, default=None, help="random seed")
+    parser.add_argument('--record', default=None, help="record the seed and controls to this replay file")
+    parser.add_argument('--vectorized-projectiles', action='store_true',
+                        help="keep shells in numpy arrays (requires numpy)")
+    parser.add_argument('--enemies', type=int, default=1, help="number of AI tanks")
+    parser.add_argument('--full-redraw', action='store_true', help="clear and flip the whole screen every frame")
+    parser.add_argument('--profile', action='store_true', help="time each loop phase and show the overlay (F3)")
+    parser.add_argument('--profile-csv', default=None, help="write per-frame phase timings to this CSV file")
+    parser.add_argument('--free-for-all', action='store_true', help="put every tank on its own team")
+    parser.add_argument('--ai-rate', type=float, default=10, help="AI decisions per second per tank")
+    parser.add_argument('--no-flow-field', action='store_true', help="steer AI tanks straight at their targets")
+    parser.add_argument('--ai-budget-ms', type=float, default=2.0, help="wall-clock limit for AI decisions per tick")
+    parser.add_argument('--pixel-collision', action='store_true',
+                        help="hit only where sprite masks overlap, circles are the broadphase")
+    parser.add_argument('--world', default=None, metavar='WxH',
+                        help="battlefield size, e.g. 6000x4000; larger than the screen scrolls")
+    parser.add_argument('--render-size', default=None, metavar='WxH',
+                        help="internal resolution scaled to the display, e.g. 1280x720")
+    parser.add_argument('--scaling', choices=('nearest', 'smooth', 'sdl'), default='nearest',
+                        help="how the internal resolution is scaled; sdl uses the SDL renderer")
+    parser.add_argument('--dynamic-resolution', action='store_true',
+                        help="lower the internal resolution while frames miss the budget")
+    parser.add_argument('--frame-budget-ms', type=float, default=None,
+                        help="frame time budget for --dynamic-resolution, 1000/fps-cap by default")
+    parser.add_argument('--soak-log', default=None,
+                        help="sample memory, objects, surfaces and mixer channels into this rotating log")
+    parser.add_argument('--soak-interval', type=float, default=60.0, help="seconds between soak samples")
+    parser.add_argument('--soak-no-tracemalloc', action='store_true',
+                        help="leave allocation tracing out of the soak samples, for full speed")
+    args = parser.parse_args()
+    if args.seed is not None and not 0 <= args.seed < 2 ** 64:
+        parser.error("--seed must be between 0 and 2**64 - 1")
+    world_size = tuple(int(n) for n in args.world.lower().split('x')) if args.world else None
+    render_size = tuple(int(n) for n in args.render_size.lower().split('x')) if args.render_size else None
+
+    game = Game(tick_rate=args.tick_rate, fps_cap=args.fps_cap, vsync=args.vsync,
+                headless=args.headless, vectorized_projectiles=args.vectorized_projectiles,
+                enemy_count=args.enemies, free_for_all=args.free_for_all,
+                dirty_rects=not args.full_redraw, profile=args.profile, profile_csv=args.profile_csv,
+                seed=args.seed, record_path=args.record,
+                ai_decision_rate=args.ai_rate, ai_budget_ms=args.ai_budget_ms,
+                flow_field=not args.no_flow_field, world_size=world_size,
+                render_size=render_size, scaling=args.scaling,
+                dynamic_resolution=args.dynamic_resolution, frame_budget_ms=args.frame_budget_ms,
+                pixel_collision=args.pixel_collision, soak_log=args.soak_log,
+                soak_interval=args.soak_interval, soak_trace=not args.soak_no_tracemalloc)
+    if args.headless:
+        for result in game.run_headless(args.matches, args.max_ticks):
+            print("winner={winner} ticks={ticks} ticks/s={ticks_per_second:.0f}".format(**result))
+        game.finish_recording()
+        game.finish_soak()
+        game.report_stats()
+    else:
+        game.run()
\ No newline at end of file
@@ -0,0 +1,760 @@
+import argparse
+import heapq
+import multiprocessing
+import random
+import socket
+import struct
+import time
+from collections import deque
+
+import pygame
+
+from audio import audio
+from explosion import Explosion
+from profiler import percentile
+from projectile import Projectile
+from replay import ReplayKeys, encode_keys
+
+# Two-player play over UDP. The host runs the authoritative Game and sends
+# quantized snapshots, delta-compressed against the last snapshot the client
+# acknowledged. The client predicts its own tank from its inputs, replays
+# unacknowledged inputs on every snapshot and interpolates everything else.
+PROTOCOL_VERSION = 1
+DEFAULT_PORT = 47800
+
+HELLO, WELCOME, INPUT, SNAPSHOT = range(1, 5)
+HELLO_PACKET = struct.Struct('<BB')  # type, version
+# type, version, tick rate, snapshot rate, width, height, enemy count, client tank, free-for-all
+WELCOME_PACKET = struct.Struct('<BBHHHHHBB')
+# type, newest input sequence, acknowledged snapshot tick, client time, mask count;
+# then the control masks, newest first, so a lost packet is covered by the next one
+INPUT_PACKET = struct.Struct('<BIIIB')
+# type, tick, baseline tick (0 for a full snapshot), last applied input,
+# echoed client time, ms the echo was held, round state, tank count
+SNAPSHOT_HEADER = struct.Struct('<BIIIIHBB')
+COUNT = struct.Struct('<H')
+SHELL = struct.Struct('<HHhhHhh')  # serial, age in ticks, x, y, angle, vx, vy
+
+# Tank fields: x, y, body angle, turret angle, speed, recoil, health, flags.
+# Each tank starts with a byte telling which fields changed since the baseline.
+TANK_FORMATS = ('H', 'H', 'H', 'H', 'h', 'h', 'B', 'B')
+FLAG_DYING = 1
+FLAG_FLASH = 2
+
+POSITION_SCALE = 4  # Quarter pixels
+SHELL_POSITION_SCALE = 2
+ANGLE_SCALE = 65536 / 360
+SPEED_SCALE = 10000
+VELOCITY_SCALE = 1000
+
+ROUND_PLAYING, ROUND_HOST_WON, ROUND_HOST_LOST = range(3)
+
+_tank_structs = {}
+
+
+def tank_struct(mask):
+    packer = _tank_structs.get(mask)
+    if packer is None:
+        packer = struct.Struct('<' + ''.join(fmt for bit, fmt in enumerate(TANK_FORMATS) if mask & 1 << bit))
+        _tank_structs[mask] = packer
+    return packer
+
+
+def clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+def quantize_angle(angle):
+    return round(angle % 360 * ANGLE_SCALE) % 65536
+
+
+def quantize_tank(tank):
+    flags = (FLAG_DYING if tank.is_dying else 0) | (FLAG_FLASH if tank.flash_visible else 0)
+    return (
+        clamp(round(tank.position.x * POSITION_SCALE), 0, 65535),
+        clamp(round(tank.position.y * POSITION_SCALE), 0, 65535),
+        quantize_angle(tank.body_angle),
+        quantize_angle(tank.turret_angle),
+        clamp(round(tank.current_speed * SPEED_SCALE), -32768, 32767),
+        clamp(round(tank.recoil_speed * SPEED_SCALE), -32768, 32767),
+        clamp(int(tank.health), 0, 255),
+        flags,
+    )
+
+
+def quantize_shell(projectile, tick):
+    # Shells fly in a straight line, so one record per shell is enough
+    return (
+        tick,
+        clamp(round(projectile.position.x * SHELL_POSITION_SCALE), -32768, 32767),
+        clamp(round(projectile.position.y * SHELL_POSITION_SCALE), -32768, 32767),
+        quantize_angle(projectile.angle),
+        clamp(round(projectile.velocity.x * VELOCITY_SCALE), -32768, 32767),
+        clamp(round(projectile.velocity.y * VELOCITY_SCALE), -32768, 32767),
+    )
+
+
+def encode_snapshot(header, state, baseline):
+    # state is (tank field tuples, {shell serial: shell record}); fields and
+    # shells equal to the baseline are left out
+    tanks, shells = state
+    base_tanks, base_shells = baseline if baseline is not None else ((), {})
+    out = bytearray(header)
+    for index, fields in enumerate(tanks):
+        old = base_tanks[index] if index < len(base_tanks) else None
+        mask = 0
+        values = []
+        for bit, value in enumerate(fields):
+            if old is None or old[bit] != value:
+                mask |= 1 << bit
+                values.append(value)
+        out.append(mask)
+        if mask:
+            out += tank_struct(mask).pack(*values)
+
+    tick = struct.unpack_from('<I', header, 1)[0]
+    removed = [serial for serial, record in base_shells.items() if shells.get(serial) != record]
+    added = [(serial, record) for serial, record in shells.items() if base_shells.get(serial) != record]
+    out += COUNT.pack(len(removed))
+    for serial in removed:
+        out += COUNT.pack(serial)
+    out += COUNT.pack(len(added))
+    for serial, (shell_tick, *values) in added:
+        out += SHELL.pack(serial, min(tick - shell_tick, 65535), *values)
+    return out
+
+
+def decode_snapshot(data, baselines):
+    # Returns (header fields, state), or None when the baseline is unknown
+    header = SNAPSHOT_HEADER.unpack_from(data)
+    _, tick, baseline_tick, _, _, _, _, tank_count = header
+    if baseline_tick:
+        baseline = baselines.get(baseline_tick)
+        if baseline is None:
+            return None
+        base_tanks, base_shells = baseline
+    else:
+        base_tanks, base_shells = (), {}
+
+    offset = SNAPSHOT_HEADER.size
+    tanks = []
+    for index in range(tank_count):
+        mask = data[offset]
+        offset += 1
+        values = iter(())
+        if mask:
+            packer = tank_struct(mask)
+            values = iter(packer.unpack_from(data, offset))
+            offset += packer.size
+        old = base_tanks[index] if index < len(base_tanks) else None
+        tanks.append(tuple(next(values) if mask & 1 << bit else old[bit]
+                           for bit in range(len(TANK_FORMATS))))
+
+    shells = dict(base_shells)
+    (count,) = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    for _ in range(count):
+        (serial,) = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        shells.pop(serial, None)
+    (count,) = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    for _ in range(count):
+        serial, age, *values = SHELL.unpack_from(data, offset)
+        offset += SHELL.size
+        shells[serial] = (tick - age, *values)
+    return header, (tuple(tanks), shells)
+
+
+STATS_WINDOW = 6000  # Recent samples kept for the reports' averages and percentiles
+
+
+def wall_clock_ms():
+    return time.perf_counter() * 1000
+
+
+# Non-blocking UDP socket that can hold outgoing packets back to simulate
+# latency, jitter and loss. Uses its own RNG so the game stays deterministic.
+class Link:
+    def __init__(self, sock, latency=0, jitter=0, loss=0.0, seed=None, clock=wall_clock_ms):
+        self.sock = sock
+        self.sock.setblocking(False)
+        self.latency = latency  # One-way delay in ms
+        self.jitter = jitter
+        self.loss = loss
+        self.rng = random.Random(seed)
+        self.clock = clock
+        self.queue = []  # (due time, order, data, address)
+        self.order = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.packets_sent = 0
+        self.packets_received = 0
+        self.packets_dropped = 0
+
+    def send(self, data, address):
+        self.bytes_sent += len(data)
+        self.packets_sent += 1
+        if self.loss and self.rng.random() < self.loss:
+            self.packets_dropped += 1
+            return
+        delay = self.latency + (self.rng.uniform(-self.jitter, self.jitter) if self.jitter else 0)
+        if delay <= 0:
+            self.sock.sendto(data, address)
+            return
+        heapq.heappush(self.queue, (self.clock() + delay, self.order, bytes(data), address))
+        self.order += 1
+
+    def flush(self):
+        now = self.clock()
+        while self.queue and self.queue[0][0] <= now:
+            _, _, data, address = heapq.heappop(self.queue)
+            self.sock.sendto(data, address)
+
+    def receive(self):
+        self.flush()
+        packets = []
+        while True:
+            try:
+                data, address = self.sock.recvfrom(65536)
+            except (BlockingIOError, InterruptedError):
+                break
+            except ConnectionResetError:
+                continue  # Windows reports an unreachable peer this way
+            self.bytes_received += len(data)
+            self.packets_received += 1
+            packets.append((data, address))
+        return packets
+
+    def close(self):
+        self.sock.close()
+
+
+# Authoritative side: feeds the client's controls into Game.remote_keys and
+# sends a snapshot every few ticks. Hooked into Game.update via game.network.
+class NetServer:
+    HISTORY = 32  # Sent snapshots kept as delta baselines
+    MAX_INPUT_BUFFER = 6  # Buffered inputs beyond this are skipped to bound latency
+
+    def __init__(self, game, port=DEFAULT_PORT, snapshot_rate=30, host='0.0.0.0', link_options=None):
+        if game.vectorized_projectiles:
+            raise ValueError("network play needs the list projectile path")
+        if not game.remote_keys:
+            raise ValueError("the game has no remote player tank (remote_players=0)")
+        if max(game.width, game.height) * POSITION_SCALE > 0xffff:
+            raise ValueError("the world is too large for quantized positions")
+        self.game = game
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind((host, port))
+        self.port = sock.getsockname()[1]
+        self.link = Link(sock, **(link_options or {}))
+        self.snapshot_rate = snapshot_rate
+        self.snapshot_interval = max(1, round(game.tick_rate / snapshot_rate))
+        self.client = None
+        self.reset_client()
+        self.snapshot_sizes = deque(maxlen=STATS_WINDOW)
+        self.snapshots_sent = 0
+        self.full_snapshots = 0
+        self.input_misses = 0
+        self.start_time = self.link.clock()
+        game.network = self
+
+    def reset_client(self):
+        self.pending = {}  # Input sequence -> control mask
+        self.next_seq = 1
+        self.input_ack = 0
+        self.acked_tick = 0
+        self.history = {}  # Tick -> sent state
+        self.shell_records = {}
+        self.echo_time = 0
+        self.echo_received = 0
+
+    def receive(self):
+        for data, address in self.link.receive():
+            kind = data[0]
+            if kind == HELLO and len(data) >= HELLO_PACKET.size:
+                self.handle_hello(data, address)
+            elif kind == INPUT and address == self.client and len(data) >= INPUT_PACKET.size:
+                self.handle_input(data)
+        self.game.remote_keys[0].mask = self.next_input()
+
+    def handle_hello(self, data, address):
+        _, version = HELLO_PACKET.unpack_from(data)
+        if version != PROTOCOL_VERSION:
+            return
+        if address != self.client:
+            self.client = address
+            self.reset_client()
+        game = self.game
+        self.link.send(WELCOME_PACKET.pack(WELCOME, PROTOCOL_VERSION, game.tick_rate, self.snapshot_rate,
+                                           game.width, game.height, game.enemy_count, 1,
+                                           1 if game.free_for_all else 0), address)
+
+    def handle_input(self, data):
+        _, seq, ack_tick, client_time, count = INPUT_PACKET.unpack_from(data)
+        masks = data[INPUT_PACKET.size:INPUT_PACKET.size + count]
+        for age, mask in enumerate(masks):
+            if seq - age > self.input_ack:
+                self.pending.setdefault(seq - age, mask)
+        if ack_tick in self.history and ack_tick > self.acked_tick:
+            self.acked_tick = ack_tick
+        self.echo_time = client_time
+        self.echo_received = self.link.clock()
+
+    def next_input(self):
+        pending = self.pending
+        while len(pending) > self.MAX_INPUT_BUFFER:
+            del pending[min(pending)]
+            self.next_seq = min(pending)
+        if self.next_seq not in pending:
+            if not self.client:
+                return 0
+            self.input_misses += 1
+            if not pending:
+                # Starved: hold the last controls until the client catches up
+                return self.game.remote_keys[0].mask
+            # The next input was lost; continue with the oldest one that arrived
+            self.next_seq = min(pending)
+        self.input_ack = self.next_seq
+        self.next_seq += 1
+        return pending.pop(self.input_ack)
+
+    def capture(self):
+        game = self.game
+        records = self.shell_records
+        shells = {}
+        for projectile in game.projectiles:
+            serial = projectile.serial & 0xffff
+            record = records.get(serial)
+            if record is None:
+                record = quantize_shell(projectile, game.ticks)
+            shells[serial] = record
+        self.shell_records = shells
+        return tuple(quantize_tank(tank) for tank in game.tanks), shells
+
+    def send(self):
+        self.link.flush()
+        game = self.game
+        if self.client is None or game.ticks % self.snapshot_interval:
+            return
+        state = self.capture()
+        baseline = self.history.get(self.acked_tick)
+        if baseline is None:
+            self.full_snapshots += 1
+        if game.show_victory:
+            round_state = ROUND_HOST_WON
+        elif game.show_game_over:
+            round_state = ROUND_HOST_LOST
+        else:
+            round_state = ROUND_PLAYING
+        hold = clamp(round(self.link.clock() - self.echo_received), 0, 65535) if self.echo_received else 0
+        header = SNAPSHOT_HEADER.pack(SNAPSHOT, game.ticks, self.acked_tick if baseline else 0,
+                                      self.input_ack, self.echo_time, hold, round_state, len(state[0]))
+        packet = encode_snapshot(header, state, baseline)
+        self.link.send(packet, self.client)
+        self.snapshot_sizes.append(len(packet))
+        self.snapshots_sent += 1
+
+        self.history[game.ticks] = state
+        oldest = game.ticks - self.HISTORY * self.snapshot_interval
+        for tick in [tick for tick in self.history if tick < oldest]:
+            del self.history[tick]
+
+    def report(self):
+        seconds = max((self.link.clock() - self.start_time) / 1000, 1e-9)
+        sizes = self.snapshot_sizes
+        return [
+            "server: {} snapshots at {} Hz, {} full".format(self.snapshots_sent, self.snapshot_rate,
+                                                            self.full_snapshots),
+            "server: snapshot bytes avg {:.0f} p95 {:.0f} max {}".format(
+                sum(sizes) / len(sizes) if sizes else 0, percentile(sizes, 0.95), max(sizes, default=0)),
+            "server: sent {:.1f} kbit/s, received {:.1f} kbit/s, {} input misses".format(
+                self.link.bytes_sent * 8 / 1000 / seconds, self.link.bytes_received * 8 / 1000 / seconds,
+                self.input_misses),
+        ]
+
+    def close(self):
+        self.game.network = None
+        self.link.close()
+
+
+# Remote player: drives its tank locally with prediction and shows the other
+# tanks interpolated between snapshots, one interpolation delay in the past
+class NetClient:
+    INPUT_REDUNDANCY = 8  # Masks repeated in every input packet
+    HISTORY = 64  # Received snapshots kept as delta baselines
+    HELLO_INTERVAL = 250  # ms between connection attempts
+
+    def __init__(self, host, port=DEFAULT_PORT, headless=False, interp_snapshots=2, link_options=None):
+        self.server = (socket.gethostbyname(host), port)
+        self.link = Link(socket.socket(socket.AF_INET, socket.SOCK_DGRAM), **(link_options or {}))
+        self.headless = headless
+        self.interp_snapshots = interp_snapshots  # Interpolation delay in snapshot intervals
+        self.game = None
+        self.tank_index = 1
+        self.keys = ReplayKeys()
+        self.seq = 0
+        self.inputs = deque()  # (sequence, mask) not yet applied by the server
+        self.baselines = {}
+        self.snapshots = deque(maxlen=32)  # (tick, state) in tick order for interpolation
+        self.newest_tick = 0
+        self.server_tick = 0.0  # Estimate of the server's current tick
+        self.shells = {}  # Serial -> Projectile shown for it
+        self.dying = []  # Server dying flag per tank, to start death animations once
+        self.rtts = deque(maxlen=STATS_WINDOW)
+        self.corrections = deque(maxlen=STATS_WINDOW)
+        self.snapshot_sizes = deque(maxlen=STATS_WINDOW)
+        self.snapshots_received = 0
+        self.lost_snapshots = 0
+        self.stale_snapshots = 0
+        self.start_time = None
+
+    def connect(self, timeout=5.0):
+        deadline = self.link.clock() + timeout * 1000
+        next_hello = 0
+        while self.link.clock() < deadline:
+            now = self.link.clock()
+            if now >= next_hello:
+                self.link.send(HELLO_PACKET.pack(HELLO, PROTOCOL_VERSION), self.server)
+                next_hello = now + self.HELLO_INTERVAL
+            for data, address in self.link.receive():
+                if address == self.server and data[0] == WELCOME and len(data) >= WELCOME_PACKET.size:
+                    self.start(WELCOME_PACKET.unpack_from(data))
+                    return True
+            time.sleep(0.005)
+        return False
+
+    def start(self, welcome):
+        from main import Game
+
+        (_, version, tick_rate, snapshot_rate, width, height,
+         enemy_count, tank_index, free_for_all) = welcome
+        # The world comes from the host; a window shows as much of it as fits the screen
+        self.game = Game(tick_rate=tick_rate, headless=self.headless, size=(width, height) if self.headless else None,
+                         world_size=(width, height), enemy_count=enemy_count,
+                         free_for_all=bool(free_for_all), autoplay=False)
+        self.game.focus_index = tank_index
+        self.tank_index = tank_index
+        self.tank = self.game.tanks[tank_index]
+        self.snapshot_interval = max(1, round(tick_rate / snapshot_rate))
+        self.interp_delay = self.interp_snapshots * self.snapshot_interval
+        self.start_time = self.link.clock()
+
+    def tick(self, keys):
+        # One fixed client tick: read snapshots, send and predict this tick's controls
+        game = self.game
+        game.sim_clock.advance(game.tick_ms)
+        game.ticks += 1
+        self.server_tick += 1
+        self.receive()
+
+        self.seq += 1
+        mask = encode_keys(keys)
+        self.inputs.append((self.seq, mask))
+        recent = [m for _, m in reversed(self.inputs)][:self.INPUT_REDUNDANCY]
+        packet = INPUT_PACKET.pack(INPUT, self.seq, self.newest_tick,
+                                   int(self.link.clock()) & 0xffffffff, len(recent)) + bytes(recent)
+        self.link.send(packet, self.server)
+
+        self.tank.save_state()
+        self.predict(mask)
+        for tank in game.tanks:
+            tank.update_death_animation()
+        game.update_explosions()
+        audio.update(game.dt)
+
+    def predict(self, mask):
+        self.keys.mask = mask
+        projectile = self.tank.handle_input(self.keys, self.game.dt)
+        if projectile:
+            projectile.release()  # Shells come from the server
+        self.tank.update_position(self.game.width, self.game.height, self.game.dt)
+
+    def receive(self):
+        for data, address in self.link.receive():
+            if address != self.server or data[0] != SNAPSHOT or len(data) < SNAPSHOT_HEADER.size:
+                continue
+            decoded = decode_snapshot(data, self.baselines)
+            if decoded is None:
+                self.stale_snapshots += 1
+                continue
+            header, state = decoded
+            tick = header[1]
+            self.snapshot_sizes.append(len(data))
+            self.snapshots_received += 1
+            self.baselines[tick] = state
+            if len(self.baselines) > self.HISTORY:
+                del self.baselines[min(self.baselines)]
+            if tick <= self.newest_tick:
+                continue  # Arrived out of order
+            self.apply_snapshot(header, state)
+
+    def apply_snapshot(self, header, state):
+        _, tick, _, input_ack, echo_time, hold, round_state, _ = header
+        if self.newest_tick:
+            self.lost_snapshots += max(0, (tick - self.newest_tick) // self.snapshot_interval - 1)
+        self.newest_tick = tick
+        self.snapshots.append((tick, state))
+        # Stay just behind the newest snapshot; the interpolation delay covers jitter
+        if tick > self.server_tick or self.server_tick > tick + 2 * self.snapshot_interval:
+            self.server_tick = tick
+        if echo_time:
+            self.rtts.append(((int(self.link.clock()) - echo_time) & 0xffffffff) - hold)
+
+        game = self.game
+        game.show_victory = round_state == ROUND_HOST_LOST
+        game.show_game_over = round_state == ROUND_HOST_WON
+        tanks = state[0]
+        if len(self.dying) != len(tanks):
+            self.dying = [False] * len(tanks)
+        for index, (tank, fields) in enumerate(zip(game.tanks, tanks)):
+            dying = bool(fields[7] & FLAG_DYING)
+            if dying and not self.dying[index]:
+                tank.start_death_sequence()
+            elif not dying and tank.is_dying:
+                tank.is_dying = False
+                tank.release_death_fires()
+            self.dying[index] = dying
+            tank.health = fields[6]
+        self.reconcile(tanks[self.tank_index], input_ack)
+
+    def reconcile(self, fields, input_ack):
+        # Rewind the own tank to the server state and replay the newer inputs
+        tank = self.tank
+        predicted = pygame.math.Vector2(tank.position)
+        tank.position.update(fields[0] / POSITION_SCALE, fields[1] / POSITION_SCALE)
+        tank.body_angle = fields[2] / ANGLE_SCALE
+        tank.turret_angle = fields[3] / ANGLE_SCALE
+        tank.current_speed = fields[4] / SPEED_SCALE
+        tank.recoil_speed = fields[5] / SPEED_SCALE
+        while self.inputs and self.inputs[0][0] <= input_ack:
+            self.inputs.popleft()
+        for _, mask in self.inputs:
+            self.predict(mask)
+        self.corrections.append((tank.position - predicted).length())
+
+    def update_view(self, alpha=1.0):
+        # Place the other tanks and the shells at the interpolated server time
+        render_tick = self.server_tick + alpha - self.interp_delay
+        older, newer = self.bracket(render_tick)
+        if older is None:
+            return
+        game = self.game
+        for index, tank in enumerate(game.tanks):
+            if index == self.tank_index or index >= len(older[1][0]):
+                continue
+            self.place_tank(index, tank, older, newer, render_tick)
+        self.place_shells(newer[1][1] if newer else older[1][1], render_tick)
+
+    def bracket(self, render_tick):
+        older = newer = None
+        for snapshot in self.snapshots:
+            if snapshot[0] <= render_tick:
+                older = snapshot
+            else:
+                newer = snapshot
+                break
+        if older is None:
+            return newer, None
+        return older, newer
+
+    def place_tank(self, index, tank, older, newer, render_tick):
+        a = older[1][0][index]
+        if newer is None:
+            b, fraction = a, 0.0
+        else:
+            b = newer[1][0][index]
+            fraction = (render_tick - older[0]) / (newer[0] - older[0])
+        width, height = self.game.width, self.game.height
+        x0, y0 = a[0] / POSITION_SCALE, a[1] / POSITION_SCALE
+        dx = wrapped(b[0] / POSITION_SCALE - x0, width)
+        dy = wrapped(b[1] / POSITION_SCALE - y0, height)
+        if dx * dx + dy * dy > tank.WRAP_JUMP ** 2:
+            # Respawned at a new round: jump instead of sliding across the map
+            x0, y0, dx, dy, fraction = x0 + dx, y0 + dy, 0, 0, 0.0
+        tank.position.update((x0 + dx * fraction) % width, (y0 + dy * fraction) % height)
+        tank.body_angle = lerp_angle(a[2] / ANGLE_SCALE, b[2] / ANGLE_SCALE, fraction)
+        tank.turret_angle = lerp_angle(a[3] / ANGLE_SCALE, b[3] / ANGLE_SCALE, fraction)
+        tank.current_speed = b[4] / SPEED_SCALE
+        tank.flash_visible = bool(b[7] & FLAG_FLASH)
+        tank.rect.center = (round(tank.position.x), round(tank.position.y))
+        tank.save_state()
+
+    def place_shells(self, records, render_tick):
+        game = self.game
+        shells = self.shells
+        for serial in [serial for serial in shells if serial not in records]:
+            projectile = shells.pop(serial)
+            game.explosions.append(Explosion.spawn(projectile.position.x, projectile.position.y))
+            audio.play('explosions', 'explosion.mp3', priority=1)
+            projectile.release()
+        visible = []
+        for serial, (tick, x, y, angle, vx, vy) in records.items():
+            if tick > render_tick:
+                continue
+            projectile = shells.get(serial)
+            if projectile is None:
+                projectile = Projectile.spawn(0, 0, angle / ANGLE_SCALE, 0, 0)
+                shells[serial] = projectile
+            steps = (render_tick - tick) * game.dt
+            projectile.position.update(x / SHELL_POSITION_SCALE + vx / VELOCITY_SCALE * steps,
+                                       y / SHELL_POSITION_SCALE + vy / VELOCITY_SCALE * steps)
+            projectile.prev_position.update(projectile.position)
+            visible.append(projectile)
+        game.projectiles = visible
+
+    def run(self):
+        game = self.game
+        running = True
+        accumulator = 0
+        while running:
+            frame_time = game.clock.tick(game.fps_cap)
+            accumulator += min(frame_time, game.MAX_FRAME_TIME)
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    game.renderer.invalidate()
+            keys = pygame.key.get_pressed()
+            if keys[pygame.K_ESCAPE]:
+                running = False
+            while accumulator >= game.tick_ms:
+                self.tick(keys)
+                accumulator -= game.tick_ms
+            alpha = accumulator / game.tick_ms
+            self.update_view(alpha)
+            game.draw(alpha)
+            game.present()
+        pygame.quit()
+
+    def report(self):
+        seconds = max((self.link.clock() - self.start_time) / 1000, 1e-9)
+        received = self.snapshots_received + self.lost_snapshots
+        return [
+            "client: {} snapshots, {:.1%} lost, {} without baseline".format(
+                self.snapshots_received, self.lost_snapshots / received if received else 0.0, self.stale_snapshots),
+            "client: received {:.1f} kbit/s, sent {:.1f} kbit/s".format(
+                self.link.bytes_received * 8 / 1000 / seconds, self.link.bytes_sent * 8 / 1000 / seconds),
+            "client: rtt p50 {:.0f} p95 {:.0f} max {:.0f} ms, interpolation delay {:.0f} ms".format(
+                percentile(self.rtts, 0.5), percentile(self.rtts, 0.95), max(self.rtts, default=0),
+                self.interp_delay * self.game.tick_ms),
+            "client: prediction error avg {:.2f} p95 {:.2f} max {:.2f} px".format(
+                sum(self.corrections) / len(self.corrections) if self.corrections else 0.0,
+                percentile(self.corrections, 0.95), max(self.corrections, default=0.0)),
+        ]
+
+    def close(self):
+        self.link.close()
+
+
+def wrapped(delta, size):
+    # Shortest offset on the wrapping battlefield
+    if delta > size / 2:
+        return delta - size
+    if delta < -size / 2:
+        return delta + size
+    return delta
+
+
+def lerp_angle(a, b, fraction):
+    return a + ((b - a + 180) % 360 - 180) * fraction
+
+
+def run_fixed(step, tick_rate, seconds):
+    # Headless loop calling step() at the tick rate in real time
+    tick_s = 1 / tick_rate
+    next_tick = time.perf_counter()
+    end = next_tick + seconds
+    while next_tick < end:
+        step()
+        next_tick += tick_s
+        delay = next_tick - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def serve_headless(port, seconds, tick_rate, snapshot_rate, seed, link_options, reports):
+    from main import Game
+
+    game = Game(tick_rate=tick_rate, headless=True, seed=seed, remote_players=1)
+    server = NetServer(game, port=port, snapshot_rate=snapshot_rate, host='127.0.0.1', link_options=link_options)
+    run_fixed(game.update, tick_rate, seconds)
+    reports.put(server.report())
+    server.close()
+
+
+def run_loopback(seconds, tick_rate, snapshot_rate, seed, port, link_options):
+    # Server and a bot client in separate processes on localhost, both with the
+    # same simulated link, then print both sides of the bandwidth/latency report
+    reports = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve_headless, args=(
+        port, seconds + 1, tick_rate, snapshot_rate, seed, link_options, reports))
+    server.start()
+    client = NetClient('127.0.0.1', port, headless=True, link_options=link_options)
+    if not client.connect():
+        server.terminate()
+        raise SystemExit("could not reach the server on port {}".format(port))
+
+    rng = random.Random(seed)
+    keys = ReplayKeys()
+    hold = [0]
+
+    def step():
+        # Bot: hold a random set of controls for a random time
+        if hold[0] <= 0:
+            keys.mask = rng.randrange(128)
+            hold[0] = rng.randint(10, 60)
+        hold[0] -= 1
+        client.tick(keys)
+        client.update_view()
+
+    run_fixed(step, tick_rate, seconds)
+    lines = client.report()
+    client.close()
+    lines = reports.get(timeout=10) + lines
+    server.join()
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tank Battle over UDP")
+    parser.add_argument('mode', choices=('server', 'client', 'loopback'),
+                        help="host a game, join one, or test both on localhost")
+    parser.add_argument('host', nargs='?', default='127.0.0.1', help="server address for client mode")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="UDP port")
+    parser.add_argument('--tick-rate', type=int, default=60, help="simulation ticks per second")
+    parser.add_argument('--snapshot-rate', type=int, default=30, help="snapshots per second (20-60)")
+    parser.add_argument('--headless', action='store_true', help="server: no window, the host tank is AI-driven")
+    parser.add_argument('--seconds', type=float, default=10, help="loopback and headless server duration")
+    parser.add_argument('--seed', type=int, default=0, help="random seed")
+    parser.add_argument('--latency', type=float, default=0, help="simulated one-way latency in ms")
+    parser.add_argument('--jitter', type=float, default=0, help="simulated latency jitter in ms")
+    parser.add_argument('--loss', type=float, default=0.0, help="simulated packet loss, 0..1")
+    parser.add_argument('--world', default=None, metavar='WxH', help="server: battlefield size, at most 16383x16383")
+    args = parser.parse_args()
+    world_size = tuple(int(n) for n in args.world.lower().split('x')) if args.world else None
+
+    link_options = {'latency': args.latency, 'jitter': args.jitter, 'loss': args.loss, 'seed': args.seed}
+    if args.mode == 'loopback':
+        lines = run_loopback(args.seconds, args.tick_rate, args.snapshot_rate, args.seed, args.port, link_options)
+    elif args.mode == 'server':
+        from main import Game
+
+        game = Game(tick_rate=args.tick_rate, headless=args.headless, seed=args.seed, remote_players=1,
+                    world_size=world_size)
+        server = NetServer(game, port=args.port, snapshot_rate=args.snapshot_rate, link_options=link_options)
+        if args.headless:
+            run_fixed(game.update, args.tick_rate, args.seconds)
+        else:
+            game.run()
+        lines = server.report()
+        server.close()
+    else:
+        client = NetClient(args.host, args.port, link_options=link_options)
+        if not client.connect():
+            raise SystemExit("could not reach {}:{}".format(args.host, args.port))
+        client.run()
+        lines = client.report()
+        client.close()
+    for line in lines:
+        print(line)
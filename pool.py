@@ -0,0 +1,33 @@
+# Free lists for short-lived entities. acquire() reuses a released object when
+# one is available and only allocates a new one when the pool is empty, so a
+# steady-state game loop allocates nothing once the pools have warmed up.
+class Pool:
+    registry = []
+
+    def __init__(self, cls):
+        self.cls = cls
+        self.free = []
+        self.allocated = 0  # Objects ever created by this pool
+        Pool.registry.append(self)
+
+    def acquire(self):
+        if self.free:
+            return self.free.pop()
+        self.allocated += 1
+        return self.cls()
+
+    def release(self, obj):
+        self.free.append(obj)
+
+    def release_all(self, objects):
+        self.free.extend(objects)
+
+
+def allocation_count():
+    # Total objects created by all pools; constant while the pools keep up
+    return sum(pool.allocated for pool in Pool.registry)
+
+
+def pool_stats():
+    return {pool.cls.__name__: {'allocated': pool.allocated, 'free': len(pool.free)}
+            for pool in Pool.registry}
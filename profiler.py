@@ -0,0 +1,151 @@
+import csv
+import os
+import time
+from collections import deque
+
+import pygame
+
+# Loop phases in the order they run; the CSV uses this column order
+PHASES = (
+    'input',
+    'check_tank_collision',
+    'update_projectiles',
+    'update_explosions',
+    'update_tanks',
+    'update_ai',
+    'draw_tanks',
+    'draw_turrets',
+    'draw_projectiles',
+    'draw_explosions',
+    'draw_hud',
+    'present',
+)
+
+
+
+def percentile(samples, fraction):
+    # Nearest-rank percentile of any iterable of numbers; 0.0 when there are none
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+# Records wall time per loop phase. Each frame's totals go into a rolling
+# window for percentiles and, optionally, one CSV row per frame.
+class FrameProfiler:
+    OVERLAY_REFRESH = 250  # Milliseconds between overlay text updates
+
+    def __init__(self, enabled=False, window=600, csv_path=None):
+        self.enabled = enabled
+        self.show_overlay = enabled
+        self.window = window
+        self.history = {phase: deque(maxlen=window) for phase in PHASES}
+        self.frame_history = deque(maxlen=window)
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.frame_start = 0.0
+        self.frames = 0
+        self.csv_file = None
+        self.csv_writer = None
+        if csv_path:
+            self.open_csv(csv_path)
+        self.font = None
+        self.overlay = None
+        self.overlay_time = 0
+
+    @classmethod
+    def from_environment(cls, enabled=False, csv_path=None):
+        # TANK_PROFILE=1 turns profiling on, TANK_PROFILE_CSV=path adds a CSV dump
+        enabled = enabled or os.environ.get('TANK_PROFILE', '') not in ('', '0')
+        csv_path = csv_path or os.environ.get('TANK_PROFILE_CSV') or None
+        return cls(enabled or bool(csv_path), csv_path=csv_path)
+
+    def open_csv(self, path):
+        self.csv_file = open(path, 'w', newline='')
+        self.csv_writer = csv.writer(self.csv_file)
+        self.csv_writer.writerow(('frame', 'frame_ms') + PHASES)
+
+    def close(self):
+        if self.csv_file:
+            self.csv_file.close()
+            self.csv_file = None
+            self.csv_writer = None
+
+    def toggle_overlay(self):
+        self.show_overlay = not self.show_overlay
+        if self.show_overlay:
+            self.enabled = True
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        for phase in PHASES:
+            self.current[phase] = 0.0
+        self.frame_start = time.perf_counter()
+
+    def start(self):
+        return time.perf_counter() if self.enabled else 0.0
+
+    def lap(self, phase, started):
+        # Adds the time since started to phase and returns the new start
+        if not self.enabled:
+            return 0.0
+        now = time.perf_counter()
+        self.current[phase] += (now - started) * 1000
+        return now
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        frame_ms = (time.perf_counter() - self.frame_start) * 1000
+        self.frames += 1
+        self.frame_history.append(frame_ms)
+        for phase in PHASES:
+            self.history[phase].append(self.current[phase])
+        if self.csv_writer:
+            self.csv_writer.writerow([self.frames, round(frame_ms, 4)] +
+                                     [round(self.current[phase], 4) for phase in PHASES])
+
+    def percentiles(self, samples):
+        return {
+            'p50': percentile(samples, 0.50),
+            'p95': percentile(samples, 0.95),
+            'p99': percentile(samples, 0.99),
+            'max': max(samples, default=0.0),
+        }
+
+    def stats(self):
+        stats = {phase: self.percentiles(self.history[phase]) for phase in PHASES}
+        stats['frame'] = self.percentiles(self.frame_history)
+        return stats
+
+    def draw_overlay(self, screen, fps, now, top=5):
+        if not (self.enabled and self.show_overlay):
+            return None
+        if self.overlay is None or now - self.overlay_time >= self.OVERLAY_REFRESH:
+            self.overlay = self._render_overlay(fps, top)
+            self.overlay_time = now
+        return screen.blit(self.overlay, (10, screen.get_height() - self.overlay.get_height() - 10))
+
+    def _render_overlay(self, fps, top):
+        if self.font is None:
+            self.font = pygame.font.Font(None, 22)
+        stats = self.stats()
+        frame = stats['frame']
+        lines = ["FPS {:.0f}  frame p50 {:.2f} p95 {:.2f} p99 {:.2f} max {:.2f} ms".format(
+            fps, frame['p50'], frame['p95'], frame['p99'], frame['max'])]
+        slowest = sorted(PHASES, key=lambda phase: stats[phase]['p95'], reverse=True)[:top]
+        for phase in slowest:
+            s = stats[phase]
+            lines.append("{:<22} p50 {:.2f} p95 {:.2f} p99 {:.2f} max {:.2f}".format(
+                phase, s['p50'], s['p95'], s['p99'], s['max']))
+        rendered = [self.font.render(line, True, (255, 255, 0)) for line in lines]
+        width = max(surface.get_width() for surface in rendered) + 10
+        height = sum(surface.get_height() for surface in rendered) + 10
+        overlay = pygame.Surface((width, height), pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, 180))
+        y = 5
+        for surface in rendered:
+            overlay.blit(surface, (5, y))
+            y += surface.get_height()
+        return overlay
@@ -1,50 +1,78 @@
-import pygame
-import os
 import math
 from pygame.math import Vector2
+from assets import assets
+from rotation_cache import rotations
+from pool import Pool
+import resolution
 
 class Projectile:
-    SHELL_SCALE = 0.1
+    SHELL_SCALE = 0.1  # At render scale 1
     MAX_DISTANCE = 1000
+    CULL_RADIUS = 20  # Half the rotated shell sprite, with room to spare
+    __slots__ = ('position', 'prev_position', 'angle', 'distance_traveled', 'velocity', 'serial', 'owner')
+    # Shared by every shell
+    image = None
+    hit_image = None  # At render scale 1, for collision masks
+    next_serial = 0  # Identifies a shell across pool reuse, e.g. in network snapshots
 
-    def __init__(self, x, y, angle, tank_speed, body_angle, speed=5):
-        self.position = Vector2(x, y)
+    def __init__(self, x=0, y=0, angle=0, tank_speed=0, body_angle=0, speed=5):
+        self.position = Vector2()
+        self.prev_position = Vector2()
+        self.velocity = Vector2()
+        if Projectile.image is None:
+            Projectile.load_image()
+        self.reset(x, y, angle, tank_speed, body_angle, speed)
+
+    @classmethod
+    def load_image(cls):
+        cls.image = assets.image('shell.png', scale=cls.SHELL_SCALE * resolution.get_scale(), flip_y=True)
+        cls.hit_image = assets.image('shell.png', scale=cls.SHELL_SCALE, flip_y=True)
+        return cls.image
+
+    @classmethod
+    def spawn(cls, x, y, angle, tank_speed, body_angle, speed=5, owner=None):
+        projectile = cls.pool.acquire()
+        projectile.reset(x, y, angle, tank_speed, body_angle, speed, owner)
+        return projectile
+
+    def release(self):
+        self.pool.release(self)
+
+    def reset(self, x, y, angle, tank_speed, body_angle, speed=5, owner=None):
+        self.position.update(x, y)
+        self.prev_position.update(x, y)
         self.angle = angle
         self.distance_traveled = 0
-        self.velocity = self._calculate_velocity(angle, speed, body_angle, tank_speed)
-        self.image = self._load_shell_image()
-        self.explosion_sound = pygame.mixer.Sound(os.path.join('sound', 'explosion.mp3'))
+        self.owner = owner  # Tank that fired it, credited with the damage
+        self.serial = Projectile.next_serial
+        Projectile.next_serial += 1
+        self._calculate_velocity(angle, speed, body_angle, tank_speed)
 
     def _calculate_velocity(self, angle, speed, body_angle, tank_speed):
-        # Calculate shell velocity
+        # Shell velocity plus tank velocity, written into self.velocity
         radians = math.radians(-angle)
-        shell_velocity = Vector2(
-            speed * math.cos(radians),
-            speed * math.sin(radians)
-        )
-        
-        # Add tank velocity
         tank_radians = math.radians(-body_angle)
-        tank_velocity = Vector2(
-            tank_speed * math.cos(tank_radians),
-            tank_speed * math.sin(tank_radians)
+        self.velocity.update(
+            speed * math.cos(radians) + tank_speed * math.cos(tank_radians),
+            speed * math.sin(radians) + tank_speed * math.sin(tank_radians)
         )
-        
-        return shell_velocity + tank_velocity
-
-    def _load_shell_image(self):
-        image = pygame.image.load(os.path.join('img', 'shell.png'))
-        image = pygame.transform.flip(image, flip_x=False, flip_y=True)
-        width = int(image.get_width() * self.SHELL_SCALE)
-        height = int(image.get_height() * self.SHELL_SCALE)
-        return pygame.transform.scale(image, (width, height))
-
-    def update(self):
-        self.position += self.velocity
-        self.distance_traveled += self.velocity.length()
+
+    def update(self, dt=1.0):
+        self.prev_position.update(self.position)
+        self.position.x += self.velocity.x * dt
+        self.position.y += self.velocity.y * dt
+        self.distance_traveled += self.velocity.length() * dt
         return self.distance_traveled <= self.MAX_DISTANCE
 
-    def draw(self, screen):
-        rotated_shell = pygame.transform.rotate(self.image, self.angle + 90)
-        shell_rect = rotated_shell.get_rect(center=self.position)
-        screen.blit(rotated_shell, shell_rect)
+    def draw(self, screen, alpha=1.0, camera=None):
+        position = self.prev_position.lerp(self.position, alpha)
+        if camera is not None:
+            position = camera.to_screen(position.x, position.y)
+            if not camera.sees(position[0], position[1], self.CULL_RADIUS):
+                return None
+        rotated_shell = rotations.get(self.image, self.angle + 90)
+        shell_rect = rotated_shell.get_rect(center=position)
+        return screen.blit(rotated_shell, shell_rect)
+
+
+Projectile.pool = Pool(Projectile)
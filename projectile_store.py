@@ -0,0 +1,130 @@
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; Game falls back to Projectile objects
+    np = None
+
+from projectile import Projectile
+from rotation_cache import rotations
+
+
+# Struct-of-arrays storage for shells: positions, velocities and distance
+# traveled live in contiguous numpy arrays and are updated in batches
+class ProjectileStore:
+    def __init__(self, capacity=1024):
+        if np is None:
+            raise ImportError("ProjectileStore requires numpy")
+        self.count = 0
+        self.positions = np.zeros((capacity, 2))
+        self.prev_positions = np.zeros((capacity, 2))
+        self.velocities = np.zeros((capacity, 2))
+        self.speeds = np.zeros(capacity)
+        self.distances = np.zeros(capacity)
+        self.angles = np.zeros(capacity)
+        self.owners = np.empty(capacity, object)
+        self.image = Projectile.image or Projectile.load_image()
+
+    def __len__(self):
+        return self.count
+
+    def _grow(self):
+        capacity = len(self.positions) * 2
+        for name in ('positions', 'prev_positions', 'velocities', 'speeds', 'distances', 'angles', 'owners'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def append(self, projectile):
+        # Takes over the state of a freshly fired Projectile
+        if self.count == len(self.positions):
+            self._grow()
+        i = self.count
+        self.positions[i] = self.prev_positions[i] = projectile.position
+        self.velocities[i] = projectile.velocity
+        self.speeds[i] = projectile.velocity.length()
+        self.distances[i] = projectile.distance_traveled
+        self.angles[i] = projectile.angle
+        self.owners[i] = projectile.owner
+        self.count += 1
+        projectile.release()
+
+    def clear(self):
+        self.owners[:self.count] = None  # Do not keep the tanks of old rounds alive
+        self.count = 0
+
+    def update(self, tank_positions, hit_radius, dt=1.0, narrow=None, sure_radius=0):
+        # Returns the positions of removed shells and, for each, the index
+        # of the tank it hit or -1 if it ran out of range, and the tank that
+        # fired it. With narrow, shells between sure_radius and hit_radius
+        # only hit if narrow(x, y, angle, tank index) agrees.
+        n = self.count
+        positions = self.positions[:n]
+        self.prev_positions[:n] = positions
+        positions += self.velocities[:n] * dt
+        self.distances[:n] += self.speeds[:n] * dt
+
+        alive = self.distances[:n] <= Projectile.MAX_DISTANCE
+        hit_tank = np.full(n, -1)
+        radius_sq = hit_radius * hit_radius
+        sure_sq = sure_radius * sure_radius
+        for index, (x, y) in enumerate(tank_positions):
+            dx = positions[:, 0] - x
+            dy = positions[:, 1] - y
+            # Like the per-object path, the first tank in order takes the hit
+            distance_sq = dx * dx + dy * dy
+            hits = alive & (hit_tank < 0) & (distance_sq < radius_sq)
+            if narrow is not None:
+                candidates = np.flatnonzero(hits)
+                for shell in candidates[distance_sq[candidates] >= sure_sq].tolist():
+                    x_shell, y_shell = positions[shell].tolist()
+                    if not narrow(x_shell, y_shell, float(self.angles[shell]), index):
+                        hits[shell] = False
+            hit_tank[hits] = index
+
+        removed = ~alive | (hit_tank >= 0)
+        removed_positions = positions[removed].copy()
+        removed_hits = hit_tank[removed]
+        removed_owners = self.owners[:n][removed]
+        if removed.any():
+            self._compact(~removed)
+        return removed_positions, removed_hits, removed_owners
+
+    def _compact(self, keep):
+        n = self.count
+        kept = int(keep.sum())
+        for array in (self.positions, self.prev_positions, self.velocities,
+                      self.speeds, self.distances, self.angles, self.owners):
+            array[:kept] = array[:n][keep]
+        self.owners[kept:n] = None
+        self.count = kept
+
+    def draw(self, screen, alpha=1.0, camera=None):
+        n = self.count
+        if n == 0:
+            return []
+        positions = self.prev_positions[:n] + (self.positions[:n] - self.prev_positions[:n]) * alpha
+        angles = self.angles[:n]
+        if camera is not None:
+            positions, angles = self._visible(positions, angles, camera)
+        blits = []
+        for (x, y), angle in zip(positions.tolist(), angles.tolist()):
+            rotated_shell = rotations.get(self.image, angle + 90)
+            width, height = rotated_shell.get_size()
+            blits.append((rotated_shell, (int(x) - width // 2, int(y) - height // 2)))
+        return screen.blits(blits)
+
+    def _visible(self, positions, angles, camera):
+        # Camera.to_screen and Camera.sees for all shells at once
+        if camera.follows:
+            origin = np.array((camera.x, camera.y))
+            world = np.array((camera.world_width, camera.world_height))
+            positions = (positions - origin) % world
+            positions -= (positions > world - camera.WRAP_MARGIN) * world
+        positions = positions * camera.zoom
+        radius = Projectile.CULL_RADIUS * camera.zoom
+        visible = ((positions[:, 0] > -radius) & (positions[:, 0] < camera.view_width + radius) &
+                   (positions[:, 1] > -radius) & (positions[:, 1] < camera.view_height + radius))
+        shown = int(visible.sum())
+        camera.drawn += shown
+        camera.culled += len(visible) - shown
+        return positions[visible], angles[visible]
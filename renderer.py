@@ -0,0 +1,63 @@
+import pygame
+
+
+# Clears and presents only the parts of the screen that changed. Every
+# sprite is still drawn each frame, but the background is cleared only where
+# something was drawn last frame and only those areas are sent to the display.
+class DirtyRectRenderer:
+    def __init__(self, background=(0, 0, 0), full_redraw_threshold=0.4, enabled=True):
+        self.background = background  # Fill color, or a callable(screen, rect) that paints it
+        self.full_redraw_threshold = full_redraw_threshold  # Fraction of the screen
+        self.enabled = enabled
+        self.prev_rects = []
+        self.rects = []
+        self.full_redraw = True
+        self.full_frames = 0
+        self.partial_frames = 0
+
+    def invalidate(self):
+        # Next frame clears and presents the whole screen
+        self.full_redraw = True
+
+    def begin(self, screen):
+        if self.full_redraw or not self.enabled:
+            self.clear(screen, None)
+        else:
+            for rect in self.prev_rects:
+                self.clear(screen, rect)
+        self.rects = []
+
+    def clear(self, screen, rect):
+        # rect None clears the whole screen
+        if callable(self.background):
+            self.background(screen, rect)
+        else:
+            screen.fill(self.background, rect)
+
+    def add(self, rects):
+        # Accepts a Rect, a list of Rects or None, as returned by the draw methods
+        if rects is None:
+            return
+        if isinstance(rects, pygame.Rect):
+            self.rects.append(rects)
+        else:
+            self.rects.extend(rect for rect in rects if rect is not None)
+
+    def present(self, screen, upscale=None):
+        # upscale, if given, copies an offscreen screen to the display, which is then flipped whole
+        dirty = self.prev_rects + self.rects
+        screen_area = screen.get_width() * screen.get_height()
+        dirty_area = sum(rect.width * rect.height for rect in dirty)
+        if upscale is not None:
+            upscale()
+            pygame.display.flip()
+            self.full_frames += 1
+        elif (self.full_redraw or not self.enabled
+                or dirty_area > screen_area * self.full_redraw_threshold):
+            pygame.display.flip()
+            self.full_frames += 1
+        else:
+            pygame.display.update(dirty)
+            self.partial_frames += 1
+        self.prev_rects = self.rects
+        self.full_redraw = False
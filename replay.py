@@ -0,0 +1,237 @@
+import argparse
+import struct
+
+import pygame
+
+# Replay file layout (little endian):
+#   header:  magic, version, seed, tick rate, width, height, enemy count, flags,
+#            AI decision rate
+#   inputs:  runs of (varint tick count, control mask byte); the RESET bit
+#            marks a tick that starts with an external reset_game() call
+#   footer:  0 varint, then the recorded round results as
+#            (varint count, then per round: result byte, varint tick)
+MAGIC = b'TBRP'
+VERSION = 2
+HEADER = struct.Struct('<4sBQHHHHBd')
+
+FLAG_FREE_FOR_ALL = 1
+FLAG_AUTOPLAY = 2
+FLAG_VECTORIZED = 4
+FLAG_PIXEL_COLLISION = 8
+FLAG_FLOW_FIELD = 16
+
+# Controls read by Tank.handle_input, one bit each
+CONTROLS = (
+    (pygame.K_UP,),
+    (pygame.K_DOWN,),
+    (pygame.K_LEFT,),
+    (pygame.K_RIGHT,),
+    (pygame.K_q, pygame.K_a),
+    (pygame.K_e, pygame.K_d),
+    (pygame.K_w,),
+)
+KEY_BITS = {key: 1 << bit for bit, keys in enumerate(CONTROLS) for key in keys}
+RESET = 0x80
+
+RESULTS = {'VICTORY': 1, 'GAME OVER': 2}
+RESULT_NAMES = {code: name for name, code in RESULTS.items()}
+
+
+def encode_keys(keys):
+    mask = 0
+    if keys is None:
+        return mask
+    for bit, controls in enumerate(CONTROLS):
+        if any(keys[key] for key in controls):
+            mask |= 1 << bit
+    return mask
+
+
+# Stands in for pygame.key.get_pressed() during a replay or for a network player
+class ReplayKeys:
+    def __init__(self, mask=0):
+        self.mask = mask
+
+    def __getitem__(self, key):
+        return bool(self.mask & KEY_BITS.get(key, 0))
+
+
+def write_varint(out, value):
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def read_varint(data, offset):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+
+# Captures the per-tick controls of a match, run-length encoded
+class Recorder:
+    def __init__(self, path, seed, game):
+        # The header stores the seed unsigned; fail now rather than when the file is written
+        if not 0 <= seed < 2 ** 64:
+            raise ValueError("replay seeds must be between 0 and 2**64 - 1, got {}".format(seed))
+        self.path = path
+        self.seed = seed
+        self.tick_rate = game.tick_rate
+        self.width = game.width
+        self.height = game.height
+        self.enemy_count = game.enemy_count
+        self.ai_decision_rate = game.ai_decision_rate
+        self.flags = ((FLAG_FREE_FOR_ALL if game.free_for_all else 0) |
+                      (FLAG_AUTOPLAY if game.autoplay else 0) |
+                      (FLAG_VECTORIZED if game.vectorized_projectiles else 0) |
+                      (FLAG_PIXEL_COLLISION if game.pixel_collision else 0) |
+                      (FLAG_FLOW_FIELD if game.flow_fields is not None else 0))
+        self.runs = []  # [mask, count]
+        self.results = []  # (result name, tick)
+        self.reset_pending = False
+
+    def mark_reset(self):
+        # The game is about to be reset outside of update(), e.g. between headless matches
+        self.reset_pending = True
+
+    def record(self, keys):
+        mask = encode_keys(keys)
+        if self.reset_pending:
+            mask |= RESET
+            self.reset_pending = False
+        if self.runs and self.runs[-1][0] == mask:
+            self.runs[-1][1] += 1
+        else:
+            self.runs.append([mask, 1])
+
+    def mark_result(self, result, tick):
+        self.results.append((result, tick))
+
+    def close(self):
+        out = bytearray(HEADER.pack(MAGIC, VERSION, self.seed, self.tick_rate, self.width,
+                                    self.height, self.enemy_count, self.flags, self.ai_decision_rate))
+        for mask, count in self.runs:
+            write_varint(out, count)
+            out.append(mask)
+        write_varint(out, 0)
+        write_varint(out, len(self.results))
+        for result, tick in self.results:
+            out.append(RESULTS[result])
+            write_varint(out, tick)
+        with open(self.path, 'wb') as f:
+            f.write(out)
+
+
+# A loaded recording that feeds its controls back one tick at a time
+class Replay:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        (magic, version, self.seed, self.tick_rate, self.width, self.height,
+         self.enemy_count, flags, self.ai_decision_rate) = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not a version {} replay".format(path, VERSION))
+        self.free_for_all = bool(flags & FLAG_FREE_FOR_ALL)
+        self.autoplay = bool(flags & FLAG_AUTOPLAY)
+        self.vectorized_projectiles = bool(flags & FLAG_VECTORIZED)
+        self.pixel_collision = bool(flags & FLAG_PIXEL_COLLISION)
+        self.flow_field = bool(flags & FLAG_FLOW_FIELD)
+
+        offset = HEADER.size
+        self.runs = []
+        while True:
+            count, offset = read_varint(data, offset)
+            if count == 0:
+                break
+            self.runs.append((data[offset], count))
+            offset += 1
+        result_count, offset = read_varint(data, offset)
+        self.results = []
+        for _ in range(result_count):
+            code = data[offset]
+            tick, offset = read_varint(data, offset + 1)
+            self.results.append((RESULT_NAMES[code], tick))
+
+        self.total_ticks = sum(count for _, count in self.runs)
+        self.keys = ReplayKeys()
+        self.reset = False  # Whether the tick just returned starts with a reset
+        self.run_index = 0
+        self.run_left = self.runs[0][1] if self.runs else 0
+
+    @property
+    def finished(self):
+        return self.run_index >= len(self.runs)
+
+    def next_keys(self):
+        if self.finished:
+            self.keys.mask = 0
+            self.reset = False
+            return self.keys
+        mask = self.runs[self.run_index][0]
+        self.keys.mask = mask & ~RESET
+        self.reset = bool(mask & RESET)
+        self.run_left -= 1
+        if self.run_left == 0:
+            self.run_index += 1
+            if not self.finished:
+                self.run_left = self.runs[self.run_index][1]
+        return self.keys
+
+    def game_options(self):
+        return {
+            'seed': self.seed,
+            'tick_rate': self.tick_rate,
+            'world_size': (self.width, self.height),
+            'enemy_count': self.enemy_count,
+            'free_for_all': self.free_for_all,
+            'autoplay': self.autoplay,
+            'vectorized_projectiles': self.vectorized_projectiles,
+            'pixel_collision': self.pixel_collision,
+            'ai_decision_rate': self.ai_decision_rate,
+            'flow_field': self.flow_field,
+        }
+
+
+def play(path, render=False):
+    # Re-simulate a recording; headless runs as fast as the CPU allows
+    from main import Game
+
+    replay = Replay(path)
+    game = Game(headless=not render, replay=replay, **replay.game_options())
+    if render:
+        game.run()
+    else:
+        while not replay.finished:
+            game.update()
+    return replay, game.round_results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded Tank Battle match")
+    parser.add_argument('path', help="replay file written with main.py --record")
+    parser.add_argument('--render', action='store_true', help="show the match instead of simulating it headless")
+    parser.add_argument('--expect', choices=sorted(RESULTS), help="fail unless the first round ends this way")
+    parser.add_argument('--at-tick', type=int, default=None, help="tick the expected result must happen at")
+    args = parser.parse_args()
+
+    replay, results = play(args.path, args.render)
+    for result, tick in results:
+        print("{} at tick {}".format(result, tick))
+    if results != replay.results[:len(results)] or len(results) < len(replay.results):
+        raise SystemExit("Replay diverged: recorded {}, replayed {}".format(replay.results, results))
+    if args.expect:
+        if not results or results[0][0] != args.expect or (
+                args.at_tick is not None and results[0][1] != args.at_tick):
+            raise SystemExit("Expected {} at tick {}, got {}".format(args.expect, args.at_tick, results[:1]))
+    print("Replay matches the recording ({} ticks)".format(replay.total_ticks))
@@ -0,0 +1,55 @@
+from collections import deque
+
+# Render pixels per world pixel. Sprite scales, draw offsets, HUD coordinates
+# and font sizes in the code are written for a scale of 1, i.e. rendering at
+# the display's resolution; drawing code multiplies them by this.
+_scale = 1.0
+
+
+def set_scale(scale):
+    global _scale
+    _scale = scale
+
+
+def get_scale():
+    return _scale
+
+
+def scaled(value):
+    # A length in render pixels, never below one
+    return max(1, round(value * _scale))
+
+
+# Picks a fraction of the configured internal resolution from recent frame
+# times: one step down when the average misses the budget, one step back up
+# when it is comfortably under. A step needs a full window of samples, so a
+# single slow frame does not change the resolution.
+class DynamicResolution:
+    LEVELS = (1.0, 0.85, 0.7, 0.5)
+    RAISE_BELOW = 0.6  # Fraction of the budget the average must stay under to step up
+
+    def __init__(self, budget_ms, window=60):
+        self.budget_ms = budget_ms
+        self.samples = deque(maxlen=window)
+        self.level = 0
+        self.changes = 0
+
+    @property
+    def fraction(self):
+        return self.LEVELS[self.level]
+
+    def update(self, frame_ms):
+        # Returns True when the fraction changed
+        self.samples.append(frame_ms)
+        if len(self.samples) < self.samples.maxlen:
+            return False
+        average = sum(self.samples) / len(self.samples)
+        if average > self.budget_ms and self.level < len(self.LEVELS) - 1:
+            self.level += 1
+        elif average < self.budget_ms * self.RAISE_BELOW and self.level > 0:
+            self.level -= 1
+        else:
+            return False
+        self.samples.clear()
+        self.changes += 1
+        return True
@@ -0,0 +1,69 @@
+import pygame
+from collections import OrderedDict
+
+
+# Caches rotated copies of shared sprites, keyed by sprite and quantized angle.
+# Least recently used entries are evicted once the byte budget is exceeded.
+class RotationCache:
+    def __init__(self, step=1.0, max_bytes=64 * 1024 * 1024):
+        self.step = step
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure(self, step=None, max_bytes=None):
+        if step is not None and step != self.step:
+            self.step = step
+            self.clear()
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def quantize(self, angle):
+        return round(angle / self.step) * self.step % 360
+
+    def get(self, image, angle):
+        key = (image, self.quantize(angle))
+        rotated = self.entries.get(key)
+        if rotated is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return rotated
+
+        self.misses += 1
+        rotated = pygame.transform.rotate(image, key[1])
+        self.entries[key] = rotated
+        self.bytes += rotated.get_pitch() * rotated.get_height()
+        self._evict()
+        return rotated
+
+    def warm(self, image):
+        steps = int(round(360 / self.step))
+        for i in range(steps):
+            self.get(image, i * self.step)
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and len(self.entries) > 1:
+            _, rotated = self.entries.popitem(last=False)
+            self.bytes -= rotated.get_pitch() * rotated.get_height()
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def stats(self):
+        return {
+            'step': self.step,
+            'entries': len(self.entries),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+rotations = RotationCache()
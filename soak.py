@@ -0,0 +1,184 @@
+import gc
+import json
+import logging
+import logging.handlers
+import os
+import sys
+import time
+import tracemalloc
+from collections import Counter, deque
+
+import pygame
+
+from audio import audio
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Classes whose live instance counts every sample reports; the rest only
+# show up when they are among the most numerous
+WATCHED_CLASSES = ('Tank', 'Projectile', 'Explosion', 'DeathFire', 'AIController', 'Loop',
+                   'FlowFields')
+TOP_CLASSES = 10
+TOP_ALLOCATORS = 10
+# Metrics checked for growth at every round start
+GROWTH_METRICS = ('rss_kb', 'traced_kb', 'objects', 'surfaces', 'surface_kb', 'sounds',
+                  'busy_channels', 'voices', 'loops')
+
+
+def rss_kb():
+    # Resident set size now, or None without /proc
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def rss_peak_kb():
+    # Highest resident set size so far, or None where getrusage is missing.
+    # Only ever rises, so it is logged but not checked for growth.
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak  # Bytes on macOS
+
+
+def live_objects():
+    # Everything the collector tracks, plus the untracked objects they hold
+    # directly or through tuples: pygame surfaces and sounds are not tracked
+    found = {}
+    pending = []
+    for obj in gc.get_objects():
+        pending.extend(gc.get_referents(obj))
+        while pending:
+            ref = pending.pop()
+            if isinstance(ref, tuple):
+                pending.extend(ref)
+            elif isinstance(ref, (pygame.Surface, pygame.mixer.Sound)):
+                found[id(ref)] = ref
+    return found.values()
+
+
+# Samples memory and resource use for unattended soak runs: periodically
+# and at the start of every round, into a rotating log of JSON lines. A
+# metric that rose at each of the last `window` round starts is flagged as
+# growth. Round samples run a full collection first, so only memory that
+# is still referenced counts.
+class SoakMonitor:
+    def __init__(self, path, interval=60.0, window=5, max_bytes=10 * 1024 * 1024, backups=5, trace=True):
+        self.interval = interval  # Wall seconds between periodic samples
+        self.window = window
+        self.logger = logging.getLogger('soak')
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups)
+        self.handler.setFormatter(logging.Formatter('%(message)s'))
+        self.logger.addHandler(self.handler)
+        self.trace = trace
+        if trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.snapshot = None  # From the previous round sample, for the growth by line
+        self.history = {metric: deque(maxlen=window + 1) for metric in GROWTH_METRICS}
+        self.growing = set()
+        self.started = time.perf_counter()
+        self.next_sample = self.started + interval
+        self.samples = 0
+        self.rounds = 0
+
+    def tick(self, game):
+        # Call once per update; samples when the interval has passed. The
+        # next one is due an interval after this one finished, and never
+        # sooner than this one took, so the game always gets at least half the time.
+        now = time.perf_counter()
+        if now >= self.next_sample:
+            self.write('sample', self.sample(game))
+            finished = time.perf_counter()
+            self.next_sample = finished + max(self.interval, finished - now)
+
+    def round_start(self, game):
+        gc.collect()
+        record = self.sample(game)
+        self.rounds += 1
+        record['round'] = self.rounds
+        if self.trace:
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                (tracemalloc.Filter(False, tracemalloc.__file__),))
+            if self.snapshot is not None:
+                record['top_growth'] = [
+                    [str(stat.traceback), round(stat.size_diff / 1024, 1), stat.count_diff]
+                    for stat in snapshot.compare_to(self.snapshot, 'lineno')[:TOP_ALLOCATORS]]
+            self.snapshot = snapshot
+        self.write('round', record)
+
+        for metric, values in self.history.items():
+            if record[metric] is None:
+                continue  # Not measurable on this platform
+            values.append(record[metric])
+            rising = len(values) > self.window and all(a < b for a, b in zip(values, list(values)[1:]))
+            if rising:
+                self.growing.add(metric)
+                self.write('growth', {'metric': metric, 'round': self.rounds, 'values': list(values)})
+
+    def sample(self, game):
+        objects = gc.get_objects()
+        counts = Counter(type(obj).__name__ for obj in objects)
+        surfaces = 0
+        surface_bytes = 0
+        sounds = 0
+        for obj in live_objects():
+            if isinstance(obj, pygame.Surface):
+                surfaces += 1
+                surface_bytes += obj.get_pitch() * obj.get_height()
+            else:
+                sounds += 1
+        del objects
+
+        record = {
+            'time': round(time.perf_counter() - self.started, 1),
+            'ticks': game.ticks,
+            'rss_kb': rss_kb(),
+            'rss_peak_kb': rss_peak_kb(),
+            'objects': sum(counts.values()),
+            'classes': {name: counts[name] for name in WATCHED_CLASSES},
+            'top_classes': counts.most_common(TOP_CLASSES),
+            'surfaces': surfaces,
+            'surface_kb': surface_bytes // 1024,
+            'sounds': sounds,
+        }
+        if pygame.mixer.get_init():
+            record['busy_channels'] = sum(pygame.mixer.Channel(i).get_busy()
+                                          for i in range(pygame.mixer.get_num_channels()))
+        else:
+            record['busy_channels'] = 0
+        record['voices'] = len(audio.voices)
+        record['loops'] = len(audio.loops)
+        if self.trace:
+            current, peak = tracemalloc.get_traced_memory()
+            record['traced_kb'] = current // 1024
+            record['traced_peak_kb'] = peak // 1024
+            record['top_allocators'] = [
+                [str(stat.traceback), round(stat.size / 1024, 1), stat.count]
+                for stat in tracemalloc.take_snapshot().statistics('lineno')[:TOP_ALLOCATORS]]
+        else:
+            record['traced_kb'] = 0
+        self.samples += 1
+        return record
+
+    def write(self, kind, record):
+        self.logger.info(json.dumps(dict(record, kind=kind)))
+
+    def close(self):
+        self.logger.removeHandler(self.handler)
+        self.handler.close()
+        if self.trace:
+            tracemalloc.stop()
+
+    def report(self):
+        if self.growing:
+            growth = "growth in " + ", ".join(sorted(self.growing))
+        else:
+            growth = "no growth"
+        return "Soak: {} samples over {} rounds, {}".format(self.samples, self.rounds, growth)
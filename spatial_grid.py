@@ -0,0 +1,57 @@
+import math
+
+
+# Uniform grid over a wrapping (toroidal) world. Items are bucketed by cell so
+# neighbour queries only look at the cells a circle overlaps, including cells
+# across the screen edges that Tank.handle_screen_wrap connects.
+class SpatialGrid:
+    def __init__(self, cell_size, width, height):
+        self.width = width
+        self.height = height
+        self.cols = max(1, int(width // cell_size))
+        self.rows = max(1, int(height // cell_size))
+        self.cell_width = width / self.cols
+        self.cell_height = height / self.rows
+        self.cells = {}
+
+    def cell(self, x, y):
+        return (int(x // self.cell_width) % self.cols,
+                int(y // self.cell_height) % self.rows)
+
+    def clear(self):
+        self.cells.clear()
+
+    def insert(self, item, x, y):
+        key = self.cell(x, y)
+        bucket = self.cells.get(key)
+        if bucket is None:
+            self.cells[key] = [item]
+        else:
+            bucket.append(item)
+
+    def rebuild(self, items):
+        # items: iterable of (item, x, y)
+        self.cells.clear()
+        for item, x, y in items:
+            self.insert(item, x, y)
+
+    def query(self, x, y, radius):
+        # All items in cells overlapping the circle, each at most once
+        col_span = min(self.cols, int(math.ceil(radius / self.cell_width)) * 2 + 1)
+        row_span = min(self.rows, int(math.ceil(radius / self.cell_height)) * 2 + 1)
+        col, row = self.cell(x, y)
+        first_col = col - col_span // 2
+        first_row = row - row_span // 2
+        found = []
+        for c in range(first_col, first_col + col_span):
+            for r in range(first_row, first_row + row_span):
+                bucket = self.cells.get((c % self.cols, r % self.rows))
+                if bucket:
+                    found.extend(bucket)
+        return found
+
+    def wrapped_delta(self, a, b):
+        # Shortest a - b on the torus
+        dx = (a.x - b.x + self.width / 2) % self.width - self.width / 2
+        dy = (a.y - b.y + self.height / 2) % self.height - self.height / 2
+        return dx, dy
@@ -1,15 +1,52 @@
 import pygame
 import math
-import os
 from projectile import Projectile
+from assets import assets
+from audio import audio
+import timing
+import resolution
+from rotation_cache import rotations
+from animation import FrameStrip
+from pool import Pool
 
 import random
 
+# One burst of fire on a dying tank
+class DeathFire:
+    __slots__ = ('pos', 'start_time', 'duration', 'image')
+
+    def __init__(self):
+        self.pos = pygame.math.Vector2()
+        self.start_time = 0
+        self.duration = 0
+        self.image = None
+
+
+DeathFire.pool = Pool(DeathFire)
+
+
 class Tank:
+    WRAP_JUMP = 100  # Moves longer than this between ticks are screen wraps
+    CULL_RADIUS = 150  # Covers the body, turret, muzzle flash and death fires
+    SPRITE_SCALE = 0.4  # At render scale 1
+    DEATH_FIRE_SIZE = 60
+    DEATH_FIRE_ANGLE_STEP = 5  # Degrees between pre-rotated fire frames
+    death_fire_frames = None  # Shared by all tanks
+    death_fire_strips = {}  # Pixel size -> rotated frames, kept across render scale changes
+    ENGINE_VOLUME = 0.05
+
     def __init__(self, x, y, tank_img='tank.png', turret_img='turret.png'):
         self.position = pygame.math.Vector2(x, y)
         self.tank_img = tank_img
         self.turret_img = turret_img
+        self.ai = None  # AIController for computer-driven tanks
+        self.death_explosions = []
+        self.load_images()
+        self.reset(x, y)
+
+    def reset(self, x, y):
+        # Back to the state of a new tank; reset_game reuses tanks between rounds
+        self.position.update(x, y)
         self.current_speed = 0
         self.max_speed = 0.5
         self.last_body_angle = 0
@@ -24,18 +61,21 @@ class Tank:
         self.recoil_force = -0.1  # Negative because it pushes tank backwards
         self.last_shot_time = 0
         self.shot_cooldown = 2000  # 2000 milliseconds = 2 seconds
-        self.load_images()
-        self.fire_sound = pygame.mixer.Sound(os.path.join('sound', 'fire.mp3'))
-        self.track_sound = pygame.mixer.Sound(os.path.join('sound', 'track.mp3'))
-        self.track_sound.set_volume(0.0)
-        self.track_sound_playing = False
-        self.track_sound_volume = 0.0  # Текущая громкость гусениц (0..1)
+        self.damage_range = (30, 50)  # Damage taken per shell hit
+        self.collision_damage_range = (5, 10)  # Damage taken per tank collision
+        self.collision_damage_interval = 100  # Sim milliseconds between collision damage rolls
+        self.last_collision_damage_time = None
+        self.shots_fired = 0
+        self.hits_taken = 0
+        self.damage_dealt = 0  # Health this tank's shells took from other teams
+        self.team = 0
+        self.sound_priority = 0  # Higher wins a mixer channel when voices run out
+        self.rect.center = (round(x), round(y))
+        self.save_state()
         self.track_sound_target_volume = 0.5  # Целевая громкость при движении
         self.track_sound_fade_speed = 0.05  # Скорость изменения громкости
-        self.engine_sound = pygame.mixer.Sound(os.path.join('sound', 'engine.mp3'))
-        self.engine_sound.set_volume(0.05)
-        self.engine_sound.play(-1)  # Включаем звук двигателя при создании танка
-        self.engine_sound_playing = True
+        # Включаем звук двигателя; stop_sounds() выключает его
+        audio.set_loop(self, 'engine', 'engine.mp3', self.ENGINE_VOLUME)
         self.push_speed = 0
         self.push_direction = None
         self.push_deceleration = 0.05
@@ -44,66 +84,68 @@ class Tank:
         self.is_dying = False
         self.death_start_time = 0
         self.death_duration = 5000  # 5 seconds in milliseconds
-        self.death_explosions = []
+        self.release_death_fires()
         self.death_next_explosion = 0
-        self.explosion_sound = pygame.mixer.Sound(os.path.join('sound', 'explosion.mp3'))
 
     def load_images(self):
-        self.body_image = pygame.image.load(os.path.join('img', self.tank_img))
-        self.body_image = pygame.transform.scale(self.body_image, 
-            (int(self.body_image.get_width() * 0.4), int(self.body_image.get_height() * 0.4)))
-        
-        self.turret_image = pygame.image.load(os.path.join('img', self.turret_img))
-        self.turret_image = pygame.transform.scale(self.turret_image, 
-            (int(self.turret_image.get_width() * 0.4), int(self.turret_image.get_height() * 0.4)))
-        
-        self.flash_image = pygame.image.load(os.path.join('img', 'fire.png'))
-        self.flash_image = pygame.transform.scale(self.flash_image, 
-            (int(self.flash_image.get_width() * 0.4), int(self.flash_image.get_height() * 0.4)))
+        # Sprites follow the render scale; call again after it changes
+        scale = self.SPRITE_SCALE * resolution.get_scale()
+        self.body_image = assets.image(self.tank_img, scale=scale)
+        self.turret_image = assets.image(self.turret_img, scale=scale)
+        self.flash_image = assets.image('fire.png', scale=scale)
+        # Collision masks come from the hull at render scale 1, whatever the drawing scale
+        self.hull_image = assets.image(self.tank_img, scale=self.SPRITE_SCALE)
         
         self.rect = self.body_image.get_rect()
         self.rect.center = (round(self.position.x), round(self.position.y))
 
+        if Tank.death_fire_frames is None:
+            size = resolution.scaled(self.DEATH_FIRE_SIZE)
+            frames = Tank.death_fire_strips.get(size)
+            if frames is None:
+                frames = FrameStrip.rotated(assets.image('fire.png', size=(size, size)), self.DEATH_FIRE_ANGLE_STEP)
+                Tank.death_fire_strips[size] = frames
+            Tank.death_fire_frames = frames
+
+    def save_state(self):
+        # Remember the previous simulation state for render interpolation
+        self.prev_position = pygame.math.Vector2(self.position)
+        self.prev_body_angle = self.body_angle
+        self.prev_turret_angle = self.turret_angle
+
+    def render_state(self, alpha):
+        # Blend previous and current state; skip blending across a screen wrap
+        delta = self.position - self.prev_position
+        if alpha >= 1 or delta.length_squared() > self.WRAP_JUMP ** 2:
+            return self.position, self.body_angle, self.turret_angle
+        position = self.prev_position + delta * alpha
+        body_angle = self.prev_body_angle + (self.body_angle - self.prev_body_angle) * alpha
+        turret_angle = self.prev_turret_angle + (self.turret_angle - self.prev_turret_angle) * alpha
+        return position, body_angle, turret_angle
+
     def _update_sounds(self):
-        # Плавное изменение громкости гусениц
-        if abs(self.current_speed) > 0.01 or self.last_body_angle != self.body_angle:  # Если танк движется
-            if not self.track_sound_playing:
-                self.track_sound.play(-1)
-                self.track_sound_playing = True
-            # Плавное увеличение громкости до целевой
-            if self.track_sound_volume < self.track_sound_target_volume:
-                self.track_sound_volume = min(
-                    self.track_sound_volume + self.track_sound_fade_speed,
-                    self.track_sound_target_volume
-                )
-                self.track_sound.set_volume(self.track_sound_volume)
-        else:  # Если танк стоит
-            # Плавное уменьшение громкости
-            if self.track_sound_volume > 0:
-                self.track_sound_volume = max(
-                    0,
-                    self.track_sound_volume - self.track_sound_fade_speed
-                )
-                self.track_sound.set_volume(self.track_sound_volume)
-            else:
-                if self.track_sound_playing:
-                    self.track_sound.stop()
-                    self.track_sound_playing = False
+        # Гусеницы звучат, пока танк движется; громкость плавно меняет AudioManager
+        moving = abs(self.current_speed) > 0.01 or self.last_body_angle != self.body_angle
+        audio.set_loop(self, 'tracks', 'track.mp3', self.track_sound_target_volume if moving else 0,
+                       fade=self.track_sound_fade_speed, priority=self.sound_priority)
 
-    def update_position(self, width, height):
+    def stop_sounds(self):
+        audio.stop_loops(self)
+
+    def update_position(self, width, height, dt=1.0):
         # Apply forward/backward movement
         radians = math.radians(-self.body_angle)
         self.position += pygame.math.Vector2(
             self.current_speed * math.cos(radians),
             self.current_speed * math.sin(radians)
-        )
+        ) * dt
 
         # Apply recoil movement
         radians = math.radians(-self.body_angle - self.turret_angle - 90)
         self.position += pygame.math.Vector2(
             self.recoil_speed * math.cos(radians),
             self.recoil_speed * math.sin(radians)
-        )
+        ) * dt
 
         # Apply push movement
         if self.push_direction:
@@ -111,7 +153,7 @@ class Tank:
             self.position += pygame.math.Vector2(
                 self.push_speed * math.cos(radians),
                 self.push_speed * math.sin(radians)
-            )
+            ) * dt
 
         # Update rectangle position
         self.rect.center = (round(self.position.x), round(self.position.y))
@@ -119,15 +161,15 @@ class Tank:
         # Reduce speeds
         if self.push_speed != 0:
             if self.push_speed > 0:
-                self.push_speed = max(0, self.push_speed - self.push_deceleration)
+                self.push_speed = max(0, self.push_speed - self.push_deceleration * dt)
             else:
-                self.push_speed = min(0, self.push_speed + self.push_deceleration)
+                self.push_speed = min(0, self.push_speed + self.push_deceleration * dt)
 
         if self.recoil_speed < 0:
-            self.recoil_speed = min(0, self.recoil_speed + self.deceleration)
+            self.recoil_speed = min(0, self.recoil_speed + self.deceleration * dt)
 
         # Update flash visibility
-        if self.flash_visible and pygame.time.get_ticks() - self.flash_start_time > self.flash_duration:
+        if self.flash_visible and timing.get_ticks() - self.flash_start_time > self.flash_duration:
             self.flash_visible = False
 
         self.handle_screen_wrap(width, height)
@@ -136,31 +178,29 @@ class Tank:
         self.push_speed = strength
         self.push_direction = direction
 
-    def handle_input(self, keys):
-        current_time = pygame.time.get_ticks()
-
+    def handle_input(self, keys, dt=1.0):
         if keys[pygame.K_UP] and self.health > 0:
-            self.current_speed = min(self.current_speed + self.acceleration, self.max_speed)
+            self.current_speed = min(self.current_speed + self.acceleration * dt, self.max_speed)
         elif keys[pygame.K_DOWN] and self.health > 0:
-            self.current_speed = max(self.current_speed - self.acceleration, -self.max_speed)
+            self.current_speed = max(self.current_speed - self.acceleration * dt, -self.max_speed)
         else:
             if self.current_speed > 0:
-                self.current_speed = max(0, self.current_speed - self.deceleration)
+                self.current_speed = max(0, self.current_speed - self.deceleration * dt)
             elif self.current_speed < 0:
-                self.current_speed = min(0, self.current_speed + self.deceleration)
+                self.current_speed = min(0, self.current_speed + self.deceleration * dt)
 
         if keys[pygame.K_LEFT] and self.health > 0:
-            self.body_angle += 0.2
+            self.body_angle += 0.2 * dt
         if keys[pygame.K_RIGHT] and self.health > 0:
-            self.body_angle -= 0.2
+            self.body_angle -= 0.2 * dt
 
         self._update_sounds()
         self.last_body_angle = self.body_angle
 
         if (keys[pygame.K_q] or keys[pygame.K_a]) and self.health > 0:
-            self.turret_angle += 0.3
+            self.turret_angle += 0.3 * dt
         if (keys[pygame.K_e] or keys[pygame.K_d]) and self.health > 0:
-            self.turret_angle -= 0.3
+            self.turret_angle -= 0.3 * dt
 
         # Use shoot() method for firing
         if keys[pygame.K_w] and self.health > 0:
@@ -169,11 +209,12 @@ class Tank:
         return None
 
     def shoot(self):
-        current_time = pygame.time.get_ticks()
+        current_time = timing.get_ticks()
         if current_time - self.last_shot_time < self.shot_cooldown:
             return None
 
-        self.fire_sound.play()
+        audio.play('fire', 'fire.mp3', self.sound_priority)
+        self.shots_fired += 1
         self.flash_visible = True
         self.flash_start_time = current_time
         self.last_shot_time = current_time
@@ -186,9 +227,9 @@ class Tank:
             SHELL_OFFSET * math.cos(angle_rad),
             SHELL_OFFSET * math.sin(angle_rad)
         )
-        return Projectile(shell_pos.x, shell_pos.y, 
+        return Projectile.spawn(shell_pos.x, shell_pos.y, 
                          self.body_angle + self.turret_angle + 90,
-                         self.current_speed, self.body_angle)
+                         self.current_speed, self.body_angle, owner=self)
 
     def handle_screen_wrap(self, screen_width, screen_height):
         if self.position.x > screen_width:
@@ -201,50 +242,77 @@ class Tank:
             self.position.y = screen_height
         self.rect.center = (round(self.position.x), round(self.position.y))
 
-    def draw_body(self, screen):
+    def screen_position(self, position, camera):
+        # Where the camera shows position, None when the tank is out of view
+        if camera is None:
+            return position
+        x, y = camera.to_screen(position.x, position.y)
+        if not camera.sees(x, y, self.CULL_RADIUS):
+            return None
+        return pygame.math.Vector2(x, y)
+
+    def draw_body(self, screen, alpha=1.0, camera=None):
         # Draw body
-        rotated_body = pygame.transform.rotate(self.body_image, self.body_angle + 90)
-        rotated_body_rect = rotated_body.get_rect(center=self.rect.center)
-        screen.blit(rotated_body, rotated_body_rect)
+        position, body_angle, _ = self.render_state(alpha)
+        position = self.screen_position(position, camera)
+        if position is None:
+            return None
+        rotated_body = rotations.get(self.body_image, body_angle + 90)
+        rotated_body_rect = rotated_body.get_rect(center=(round(position.x), round(position.y)))
+        return screen.blit(rotated_body, rotated_body_rect)
 
-    def draw_turret(self, screen):
+    def draw_turret(self, screen, alpha=1.0, camera=None):
         # Draw turret
-        angle_rad = math.radians(-(self.body_angle + self.turret_angle + 90))
-        offset = pygame.math.Vector2(20 * math.cos(angle_rad), 20 * math.sin(angle_rad))
+        world_position, body_angle, turret_angle = self.render_state(alpha)
+        position = self.screen_position(world_position, camera)
+        if position is None:
+            return None
+        zoom = camera.zoom if camera is not None else 1.0
+        angle_rad = math.radians(-(body_angle + turret_angle + 90))
+        offset = pygame.math.Vector2(20 * math.cos(angle_rad), 20 * math.sin(angle_rad)) * zoom
         
-        rotated_turret = pygame.transform.rotate(self.turret_image, 
-                                               self.body_angle + self.turret_angle + 90)
-        turret_pos = self.position + offset
+        rotated_turret = rotations.get(self.turret_image,
+                                       body_angle + turret_angle + 90)
+        turret_pos = position + offset
         turret_rect = rotated_turret.get_rect(center=turret_pos)
-        screen.blit(rotated_turret, turret_rect)
+        rects = [screen.blit(rotated_turret, turret_rect)]
 
         # Draw muzzle flash if active
         if self.flash_visible:
-            angle_rad = math.radians(-(self.body_angle + self.turret_angle + 90))
-
             FLASH_OFFSET = 90
-            flash_offset = pygame.math.Vector2(FLASH_OFFSET * math.cos(angle_rad), FLASH_OFFSET * math.sin(angle_rad))
+            flash_offset = pygame.math.Vector2(FLASH_OFFSET * math.cos(angle_rad), FLASH_OFFSET * math.sin(angle_rad)) * zoom
 
-            rotated_flash = pygame.transform.rotate(self.flash_image,
-                                                    self.body_angle + self.turret_angle + 90)
-            flash_pos = self.position + flash_offset
+            rotated_flash = rotations.get(self.flash_image,
+                                          body_angle + turret_angle + 90)
+            flash_pos = position + flash_offset
             flash_rect = rotated_flash.get_rect(center=flash_pos)
-            screen.blit(rotated_flash, flash_rect)
+            rects.append(screen.blit(rotated_flash, flash_rect))
 
         if self.is_dying:
-            for explosion in self.death_explosions:
-                rect = explosion['image'].get_rect(center=explosion['pos'])
-                screen.blit(explosion['image'], rect)
-
-    def take_damage(self):
-        damage = random.randint(30, 50)
+            for fire in self.death_explosions:
+                rect = fire.image.get_rect(center=position + (fire.pos - world_position) * zoom)
+                rects.append(screen.blit(fire.image, rect))
+        return rects
+
+    def take_damage(self, attacker=None):
+        damage = random.randint(*self.damage_range)
+        if attacker is not None and attacker.team != self.team:
+            attacker.damage_dealt += min(damage, self.health)
+        self.hits_taken += 1
         self.health = max(0, self.health - damage)
         if self.health == 0 and not self.is_dying:
             self.start_death_sequence()
         return damage
 
     def take_collision_damage(self):
-        damage = random.randint(5, 10)
+        # At most once per interval of sim time while touching, so a bump
+        # costs the same at any tick rate
+        current_time = timing.get_ticks()
+        if (self.last_collision_damage_time is not None and
+                current_time - self.last_collision_damage_time < self.collision_damage_interval):
+            return 0
+        self.last_collision_damage_time = current_time
+        damage = random.randint(*self.collision_damage_range)
         self.health = max(0, self.health - damage)
         if self.health == 0 and not self.is_dying:
             self.start_death_sequence()
@@ -252,16 +320,17 @@ class Tank:
 
     def start_death_sequence(self):
         self.is_dying = True
-        self.death_start_time = pygame.time.get_ticks()
-        self.explosion_sound.play()
+        self.death_start_time = timing.get_ticks()
+        audio.play('explosions', 'explosion.mp3', priority=2)
 
     def update_death_animation(self):
         if not self.is_dying:
             return
         
-        current_time = pygame.time.get_ticks()
+        current_time = timing.get_ticks()
         if current_time - self.death_start_time > self.death_duration:
             self.is_dying = False
+            self.release_death_fires()
             return
 
         # Add new explosion every 100ms
@@ -270,70 +339,82 @@ class Tank:
             # Random position within tank's rectangle
             x_offset = random.randint(-30, 30)
             y_offset = random.randint(-30, 30)
-            pos = self.position + pygame.math.Vector2(x_offset, y_offset)
+            fire = DeathFire.pool.acquire()
+            fire.pos.update(self.position.x + x_offset, self.position.y + y_offset)
             
             # Random rotation angle
             rotation_angle = random.randint(0, 360)
-            explosion_img = pygame.transform.scale(
-                pygame.image.load(os.path.join('img', 'fire.png')),
-                (60, 60)
-            )
-            rotated_explosion = pygame.transform.rotate(explosion_img, rotation_angle)
-
-            self.death_explosions.append({
-                'pos': pos,
-                'start_time': current_time,
-                'duration': random.randint(300, 700),
-                'image': rotated_explosion
-            })
-
-        # Update existing explosions
-        self.death_explosions = [exp for exp in self.death_explosions 
-                               if current_time - exp['start_time'] < exp['duration']]
-
-    def draw_health_bar(self, screen, x, y):
-        bar_width = 200
-        bar_height = 30
+            fire.image = self.death_fire_frames.frame_for_angle(rotation_angle)
+            fire.start_time = current_time
+            fire.duration = random.randint(300, 700)
+            self.death_explosions.append(fire)
+
+        # Update existing explosions, compacting the list in place
+        explosions = self.death_explosions
+        kept = 0
+        for fire in explosions:
+            if current_time - fire.start_time < fire.duration:
+                explosions[kept] = fire
+                kept += 1
+            else:
+                DeathFire.pool.release(fire)
+        del explosions[kept:]
+
+    def release_death_fires(self):
+        DeathFire.pool.release_all(self.death_explosions)
+        self.death_explosions.clear()
+
+    def draw_health_bar(self, screen, x, y, bar_width=200, bar_height=30):
         fill_width = int((self.health / self.max_health) * bar_width)
         
         # Draw background
-        pygame.draw.rect(screen, (128, 128, 128), (x, y, bar_width, bar_height))
+        rect = pygame.draw.rect(screen, (128, 128, 128), (x, y, bar_width, bar_height))
         # Draw health
         pygame.draw.rect(screen, (255, 0, 0), (x, y, fill_width, bar_height))
         # Draw border
-        pygame.draw.rect(screen, (255, 255, 255), (x, y, bar_width, bar_height), 2)
+        pygame.draw.rect(screen, (255, 255, 255), (x, y, bar_width, bar_height), 1 if bar_height < 10 else 2)
+        return rect
 
-    def __del__(self):
-        # Останавливаем все звуки при удалении объекта
-        if self.track_sound_playing:
-            self.track_sound.stop()
-        if self.engine_sound_playing:
-            self.engine_sound.stop()
-
-    def move_to_target(self, target_pos):
+    def move_to_target(self, target_pos, dt=1.0):
         if self.health <= 0:
-            self.current_speed = max(self.current_speed - self.deceleration, 0)
+            self.current_speed = max(self.current_speed - self.deceleration * dt, 0)
             return False
 
         # Calculate angle to target
         direction = target_pos - self.position
         target_angle = - (math.degrees(math.atan2(direction.y, direction.x)))
         
-        # Normalize angle difference to -180 to 180
-        angle_diff = (target_angle - self.body_angle) % 360
-        if angle_diff > 180:
-            angle_diff -= 360
-            
         # Rotate towards target
-        if abs(angle_diff) > 0.5:
-            self.body_angle += 0.3 if angle_diff > 0 else -0.3
+        if abs(self.turn_towards(target_angle, dt)) > 0.5:
             return False
             
         # Move forward if pointing at target
-        self.current_speed = min(self.current_speed + self.acceleration, self.max_speed)
+        self.current_speed = min(self.current_speed + self.acceleration * dt, self.max_speed)
         return direction.length() < 50  # Return True if reached target
 
-    def aim_turret_at(self, target_pos):
+    def turn_towards(self, target_angle, dt=1.0):
+        # Rotates the body toward target_angle; returns the difference before turning
+        # Normalize angle difference to -180 to 180
+        angle_diff = (target_angle - self.body_angle) % 360
+        if angle_diff > 180:
+            angle_diff -= 360
+        if abs(angle_diff) > 0.5:
+            # Don't overshoot when a large time step covers the remaining angle
+            step = min(0.3 * dt, abs(angle_diff))
+            self.body_angle += step if angle_diff > 0 else -step
+        return angle_diff
+
+    def move_along(self, heading, dt=1.0):
+        # Follow a flow field heading, driving on while the turn is gentle
+        if self.health <= 0:
+            self.current_speed = max(self.current_speed - self.deceleration * dt, 0)
+            return
+        if abs(self.turn_towards(heading, dt)) < 45:
+            self.current_speed = min(self.current_speed + self.acceleration * dt, self.max_speed)
+        else:
+            self.current_speed = max(self.current_speed - self.acceleration * dt, 0)
+
+    def aim_turret_at(self, target_pos, dt=1.0):
         if self.health <= 0:
             return 
 
@@ -347,4 +428,4 @@ class Tank:
             angle_diff -= 360
             
         # Rotate turret towards target
-        self.turret_angle += angle_diff * 0.005
+        self.turret_angle += angle_diff * min(0.005 * dt, 1.0)
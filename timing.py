@@ -0,0 +1,38 @@
+import pygame
+
+
+# Real time since pygame.init(), the way the game used to measure everything
+class WallClock:
+    def get_ticks(self):
+        return pygame.time.get_ticks()
+
+    def advance(self, ms):
+        pass
+
+
+# Simulated time that only moves when the game advances it, one tick at a time
+class SimClock:
+    def __init__(self, start=0):
+        self.ticks = start
+
+    def get_ticks(self):
+        return int(self.ticks)
+
+    def advance(self, ms):
+        self.ticks += ms
+
+
+_clock = WallClock()
+
+
+def set_clock(clock):
+    global _clock
+    _clock = clock
+
+
+def get_clock():
+    return _clock
+
+
+def get_ticks():
+    return _clock.get_ticks()